@@ -7,6 +7,12 @@ import {
 } from 'lucide-react';
 
 const API_BASE_URL = 'http://localhost:5000/api';
+const ASSET_ORIGIN = new URL(API_BASE_URL).origin;
+
+// Image URLs from the API are root-relative unless the server sets PUBLIC_ASSET_URL;
+// they are served by the API, not by this dev server, so resolve them against its origin
+const assetUrl = (url) => (url && url.startsWith('/') ? ASSET_ORIGIN + url : url);
+const assetSrcSet = (srcset) => srcset && srcset.split(', ').map(assetUrl).join(', ');
 
 const ProductCard = (props) => {
     const { product, onAddToCart, onAddToWishlist, isWishlisted } = props;
@@ -16,7 +22,14 @@ const ProductCard = (props) => {
     });
     return (
         <div className="product-card">
-            <img src={product.image_url} alt={product.name} className="product-image" />
+            <img
+                src={assetUrl(product.image_variants?.card?.jpeg || product.image_url)}
+                srcSet={assetSrcSet(product.srcset)}
+                sizes="(max-width: 640px) 100vw, 320px"
+                loading="lazy"
+                alt={product.name}
+                className="product-image"
+            />
             <div className="product-info">
                 <h3 className="product-name">{product.name}</h3>
                 <p className="product-price">{formattedPrice}</p>
@@ -163,30 +176,39 @@ function Home({ authToken, handleWishlistChange, handleCartChange, isLoggedIn })
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const [category, setCategory] = useState('All');
+    const [facets, setFacets] = useState(null);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [pageSize, setPageSize] = useState(24);
+    const [loadingMore, setLoadingMore] = useState(false);
+
+    useEffect(() => {
+        // Per-category counts for the navigation bar; the products still load if this fails
+        fetch(`${API_BASE_URL}/products/facets`)
+            .then(response => response.ok ? response.json() : null)
+            .then(data => setFacets(data))
+            .catch(e => console.error("Facet fetch failed:", e));
+    }, []);
 
     const fetchProducts = async () => {
         setLoading(true);
         try {
-            const productsResponse = await fetch(`${API_BASE_URL}/products?category=${category}`);
-            const productsData = await productsResponse.json();
-
-            let wishlistData = [];
-            if (isLoggedIn && authToken) {
-                const wishlistResponse = await fetch(`${API_BASE_URL}/wishlist`, {
-                    headers: {
-                        'Authorization': `Bearer ${authToken}`,
-                        'Content-Type': 'application/json'
-                    }
-                });
-                if (wishlistResponse.ok) {
-                    wishlistData = await wishlistResponse.json();
-                } else {
-                    console.error("Wishlist fetch failed with status:", wishlistResponse.status);
-                    wishlistData = [];
-                }
+            // One round trip: first catalog page, wishlist product ids and a cart summary
+            const bootstrapUrl = `${API_BASE_URL}/session/bootstrap?category=${encodeURIComponent(category)}`;
+            let response = await fetch(bootstrapUrl, {
+                headers: isLoggedIn && authToken ? { 'Authorization': `Bearer ${authToken}` } : {}
+            });
+            if (response.status === 401) {
+                // Expired or revoked token: still show the catalog, just without the wishlist
+                console.error("Bootstrap rejected the stored token; loading anonymously.");
+                response = await fetch(bootstrapUrl);
             }
-            setProducts(productsData);
-            setWishlistIds(wishlistData.map(item => item.product_id));
+            if (!response.ok) throw new Error(`Bootstrap failed with status ${response.status}`);
+            const data = await response.json();
+
+            setProducts(data.catalog.items);
+            setNextCursor(data.catalog.next_cursor);
+            setPageSize(data.catalog.limit);
+            setWishlistIds(data.wishlist_ids);
             setError(null);
         } catch (e) {
             setError('Failed to fetch products or wishlist.');
@@ -196,6 +218,23 @@ function Home({ authToken, handleWishlistChange, handleCartChange, isLoggedIn })
         }
     };
 
+    const loadMoreProducts = async () => {
+        if (!nextCursor) return;
+        setLoadingMore(true);
+        try {
+            const response = await fetch(`${API_BASE_URL}/products?category=${encodeURIComponent(category)}&limit=${pageSize}&after=${encodeURIComponent(nextCursor)}`);
+            if (!response.ok) throw new Error(`Product page fetch failed with status ${response.status}`);
+            const data = await response.json();
+            setProducts(currentProducts => [...currentProducts, ...data.items]);
+            setNextCursor(data.next_cursor);
+        } catch (e) {
+            alert('Error loading more products.');
+            console.error(e);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     useEffect(() => {
         fetchProducts();
     }, [authToken, isLoggedIn, category]);
@@ -245,6 +284,12 @@ function Home({ authToken, handleWishlistChange, handleCartChange, isLoggedIn })
     if (error) return <div className="page-message error">Error: {error}</div>;
 
     const categories = ['All', 'Furniture', 'Clothes', 'Stationary'];
+    const categoryCount = (cat) => {
+        if (!facets) return null;
+        if (cat === 'All') return facets.total.product_count;
+        const facet = facets.categories.find(f => f.category === cat);
+        return facet ? facet.product_count : 0;
+    };
 
     return (
         <div className="page-container">
@@ -256,7 +301,7 @@ function Home({ authToken, handleWishlistChange, handleCartChange, isLoggedIn })
                         className={`btn-category ${category === cat ? 'active' : ''}`}
                         onClick={() => setCategory(cat)}
                     >
-                        {cat}
+                        {cat}{categoryCount(cat) !== null && ` (${categoryCount(cat)})`}
                     </button>
                 ))}
             </div>
@@ -271,6 +316,13 @@ function Home({ authToken, handleWishlistChange, handleCartChange, isLoggedIn })
                     />
                 ))}
             </div>
+            {nextCursor && (
+                <div className="load-more">
+                    <button className="btn-category" onClick={loadMoreProducts} disabled={loadingMore}>
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                    </button>
+                </div>
+            )}
         </div>
     );
 }
@@ -443,7 +495,7 @@ function Cart({ authToken, isLoggedIn, cartUpdateFlag, handleCartChange }) {
                 <div className="cart-items-list">
                     {cartItems.map(item => (
                         <div className="cart-item" key={item.id}>
-                            <img src={item.product.image_url} alt={item.product.name} className="cart-item-image" />
+                            <img src={assetUrl(item.product.image_variants?.thumbnail?.jpeg || item.product.image_url)} alt={item.product.name} className="cart-item-image" />
                             <div className="cart-item-details">
                                 <h3 className="cart-item-name">{item.product.name}</h3>
                                 <p className="cart-item-price">{formatCurrency(item.product.price)}</p>
@@ -578,7 +630,7 @@ function AdminDashboard({ authToken, isAdmin }) {
                         <div className="product-list">
                             {products.map(product => (
                                 <div className="product-list-item" key={product.id}>
-                                    <img src={product.image_url} alt={product.name} className="list-item-image" />
+                                    <img src={assetUrl(product.image_variants?.thumbnail?.jpeg || product.image_url)} alt={product.name} className="list-item-image" loading="lazy" />
                                     <div className="list-item-info">
                                         <h3>{product.name}</h3>
                                         <p>Price: ₹{product.price.toFixed(2)} | Stock: {product.stock} | Cat: {product.category}</p>
@@ -614,13 +666,21 @@ function LayoutAndRoutes() {
     };
 
     const handleLogout = async () => {
+        // The server revokes only the bearer token sent with /logout, so keep a copy for
+        // that request before local state is cleared
+        const token = authToken;
         localStorage.removeItem('authToken');
         localStorage.removeItem('userRole');
         setAuthToken(null);
         setUserRole(null);
         setIsLoggedIn(false);
         try {
-            await fetch(`${API_BASE_URL}/logout`, { method: 'POST' });
+            if (token) {
+                await fetch(`${API_BASE_URL}/logout`, {
+                    method: 'POST',
+                    headers: { 'Authorization': `Bearer ${token}` }
+                });
+            }
         } catch (e) {
             console.error('Logout communication error:', e);
         }
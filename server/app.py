@@ -1,31 +1,99 @@
 import os
+import click
 from flask import Flask, jsonify, send_from_directory
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
-from extensions import db, bcrypt, migrate, jwt, cors
-from models import User
+from extensions import (
+    db, jwt, cors, catalog_cache, password_hasher, image_processor, request_metrics, log_pipeline,
+    response_compressor, rate_limiter
+)
 from routes.admin_routes import admin_api
 from routes.user_routes import user_api
 from routes.product_routes import product_api
+from search import search_cli
+from facets import facets_cli
+from images import images_cli, original_for_variant
+from uploads import is_content_addressed, upload_cleaner
+from security import init_auth_state, token_blocklist
+from database import configure_binds, init_engine_profile
+from metrics import (
+    password_hasher_collector, catalog_cache_collector, log_pipeline_collector, compression_collector,
+    rate_limiter_collector
+)
+
+def init_migrations(app):
+    # Flask-Migrate imports alembic, the bulk of the import time, and only CLI commands use it
+    from flask_migrate import Migrate
+    Migrate(app, db, render_as_batch=True)
 
 def create_app(config_class=Config):
 
     app = Flask(__name__)
 
     app.config.from_object(config_class)
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    proxies = app.config.get('TRUSTED_PROXY_COUNT', 0)
+    if proxies:
+        # request.remote_addr is then the real client, which rate limits and logs key on
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
 
+    # Logging first, so app.logger and every extension log through the queue
+    log_pipeline.init_app(app)
+    configure_binds(app)
     db.init_app(app)
-    bcrypt.init_app(app)
-    migrate.init_app(app, db)
+    init_engine_profile(app)
+    if click.get_current_context(silent=True) is not None:
+        # Running under the flask CLI (flask db upgrade, flask run, ...)
+        init_migrations(app)
     jwt.init_app(app)
     cors.init_app(app, resources={r"/api/*": {"origins": "http://localhost:3000"}})
+    catalog_cache.init_app(app)
+    password_hasher.init_app(app)
+    init_auth_state(app)
+    image_processor.init_app(app)
+    upload_cleaner.init_app(app)
+    request_metrics.init_app(app)
+    # Registered after the metrics hooks so it runs before them and response sizes are on-the-wire sizes
+    response_compressor.init_app(app)
+    # After the metrics hooks too, so throttled requests are still counted
+    rate_limiter.init_app(app)
+    request_metrics.add_collector('password_hasher', password_hasher_collector(password_hasher))
+    request_metrics.add_collector('catalog_cache', catalog_cache_collector(catalog_cache))
+    request_metrics.add_collector('logging', log_pipeline_collector(log_pipeline))
+    request_metrics.add_collector('compression', compression_collector(response_compressor))
+    request_metrics.add_collector('rate_limiter', rate_limiter_collector(rate_limiter))
 
     app.register_blueprint(admin_api, url_prefix='/api/admin')
     app.register_blueprint(user_api, url_prefix='/api')
     app.register_blueprint(product_api, url_prefix='/api')
 
+    app.cli.add_command(search_cli)
+    app.cli.add_command(images_cli)
+    app.cli.add_command(facets_cli)
+
+    @jwt.token_in_blocklist_loader
+    def check_token_revoked(jwt_header, jwt_payload):
+        return token_blocklist.is_revoked(jwt_payload['jti'])
+
     @app.route('/uploads/<string:filename>')
     def serve_upload(filename):
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+        upload_folder = app.config['UPLOAD_FOLDER']
+        if not os.path.exists(os.path.join(upload_folder, filename)):
+            # Derivatives are generated in the background; fall back to the original meanwhile
+            original = original_for_variant(filename, upload_folder)
+            if original:
+                return send_from_directory(upload_folder, original, max_age=0)
+
+        if not is_content_addressed(filename):
+            return send_from_directory(upload_folder, filename)
+
+        # Content-addressed files never change: cache forever, validate by hash, allow Range
+        response = send_from_directory(upload_folder, filename, conditional=True,
+                                       etag=filename.rsplit('.', 1)[0],
+                                       max_age=app.config['UPLOAD_CACHE_MAX_AGE'])
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
 
     @app.route('/')
     def index():
@@ -33,7 +101,6 @@ def create_app(config_class=Config):
 
     return app
 
-app = create_app()
-
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # Development server only; use serve.py in production
+    create_app().run(debug=True)
\ No newline at end of file
@@ -0,0 +1,341 @@
+"""Latency and throughput benchmark for the API routes.
+
+Seeds a synthetic data set into a temporary SQLite database, then drives every
+route through the Flask test client (and, with --http, through a threaded local
+server hit by concurrent clients). Reports throughput, p50/p95/p99 latency and
+SQL statements per request, and writes the results as JSON so runs can be
+compared across commits.
+
+    python benchmark.py --products 100000 --users 50000 --requests 200
+    python benchmark.py --http --concurrency 8 --compare baseline.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from flask_jwt_extended import create_access_token
+from sqlalchemy import func, select
+from config import Config
+from query_plans import _fill
+from sql_tracking import record_queries
+
+# (label, method, path, json body, identity the request runs as)
+# 'owner' users have seeded carts and wishlists; 'shopper' users start empty, so
+# every iteration gets its own user and the write routes never collide.
+ROUTES = (
+    ('catalog first page', 'GET', '/api/products?limit=24', None, None),
+    ('catalog next page', 'GET', '/api/products?limit=24&after={cursor}', None, None),
+    ('catalog filtered sort', 'GET', '/api/products?limit=24&sort=price_asc&price_max=500&in_stock=1', None, None),
+    ('catalog category list', 'GET', '/api/products?category={category}&fields=id,name,price', None, None),
+    ('category facets', 'GET', '/api/products/facets', None, None),
+    ('product detail', 'GET', '/api/products/{product_id}', None, None),
+    ('search', 'GET', '/api/products/search?q={term}', None, None),
+    ('register', 'POST', '/api/register', {'email': '{new_email}', 'password': '{password}'}, None),
+    ('login', 'POST', '/api/login/user', {'email': '{email}', 'password': '{password}'}, None),
+    ('cart', 'GET', '/api/cart', None, 'owner'),
+    ('wishlist', 'GET', '/api/wishlist', None, 'owner'),
+    ('add to cart', 'POST', '/api/cart', {'product_id': '{product_id}', 'quantity': 1}, 'shopper'),
+    ('batch cart update', 'PATCH', '/api/cart',
+     {'operations': [{'op': 'set', 'product_id': '{product_id}', 'quantity': 2}]}, 'shopper'),
+    ('update cart item', 'PUT', '/api/cart/{cart_item_id}', {'quantity': 1}, 'owner'),
+    ('add to wishlist', 'POST', '/api/wishlist', {'product_id': '{product_id}'}, 'shopper'),
+    ('remove from wishlist', 'DELETE', '/api/wishlist/{product_id}', None, 'shopper'),
+    ('remove from cart', 'DELETE', '/api/cart/{cart_item_id}', None, 'owner'),
+    ('admin users', 'GET', '/api/admin/users', None, 'admin'),
+    ('admin delete product', 'DELETE', '/api/admin/products/{delete_product_id}', None, 'admin'),
+)
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile; sorted_values must be non-empty
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize(latencies, elapsed, statuses, sql_counts):
+    ordered = sorted(latencies)
+    result = {
+        'requests': len(ordered),
+        'errors': sum(count for status, count in statuses.items() if status >= 400),
+        'status_codes': {str(status): count for status, count in sorted(statuses.items())},
+        'throughput_rps': round(len(ordered) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(ordered) / len(ordered) * 1000, 3),
+            'p50': round(percentile(ordered, 50) * 1000, 3),
+            'p95': round(percentile(ordered, 95) * 1000, 3),
+            'p99': round(percentile(ordered, 99) * 1000, 3),
+            'max': round(ordered[-1] * 1000, 3),
+        },
+    }
+    if sql_counts:
+        result['sql_statements'] = {'mean': round(sum(sql_counts) / len(sql_counts), 2),
+                                    'max': max(sql_counts)}
+    return result
+
+class Fixtures:
+    """Per-iteration placeholder values, so repeated writes hit distinct rows."""
+
+    def __init__(self, db, products, users, cart_users):
+        from models import CartItem, Product
+        from seed import SEED_PASSWORD, WORDS, CATEGORIES
+
+        self.words = WORDS
+        self.categories = CATEGORIES
+        self.password = SEED_PASSWORD
+        half = products // 2
+        # One cart item per seeded owner, on a product that can still take quantity 1. Only the
+        # first half of the catalog is used: the admin delete route removes products from the
+        # second half, and their cart items would vanish before a later pass updates them.
+        self.owner_items = db.session.execute(
+            select(func.min(CartItem.id), CartItem.user_id)
+            .join(Product, Product.id == CartItem.product_id)
+            .where(Product.stock >= 1, Product.id <= half)
+            .group_by(CartItem.user_id)
+            .order_by(CartItem.user_id)
+        ).all()
+        # Shoppers are the seeded users without a cart (ids after the cart owners)
+        self.shoppers = list(range(cart_users + 2, users + 2))
+        self.stocked = db.session.execute(
+            select(Product.id).where(Product.stock >= 25, Product.id <= half).order_by(Product.id)
+        ).scalars().all()
+        # Deletions come from the other half so they never remove a product another route uses
+        self.deletable = list(range(products, half, -1))
+        self._tokens = {}
+        self.cursor = None
+
+    def capacity(self):
+        return min(len(self.owner_items), len(self.shoppers), len(self.deletable))
+
+    def _headers(self, user_id, is_admin=False):
+        if user_id not in self._tokens:
+            token = create_access_token(identity=str(user_id), additional_claims={'is_admin': is_admin})
+            self._tokens[user_id] = {'Authorization': 'Bearer ' + token}
+        return self._tokens[user_id]
+
+    def request_for(self, route, i):
+        label, method, path, body, identity = route
+        cart_item_id, owner_id = self.owner_items[i % len(self.owner_items)]
+        shopper_id = self.shoppers[i % len(self.shoppers)]
+        values = {
+            'cursor': self.cursor,
+            'category': self.categories[i % len(self.categories)],
+            'term': self.words[i % len(self.words)],
+            'product_id': self.stocked[i % len(self.stocked)],
+            'delete_product_id': self.deletable[i % len(self.deletable)],
+            'cart_item_id': cart_item_id,
+            # Seeded emails are user{n} for user id n + 2
+            'email': f'user{owner_id - 2}@example.com',
+            'new_email': f'bench{i}@example.com',
+            'password': self.password,
+        }
+        headers = {}
+        if identity == 'owner':
+            headers = self._headers(owner_id)
+        elif identity == 'shopper':
+            headers = self._headers(shopper_id)
+        elif identity == 'admin':
+            headers = self._headers(1, is_admin=True)
+        return method, _fill(path, values), _fill(body, values), headers
+
+def run_test_client(app, fixtures, routes, start, count, warmup, cold_cache):
+    from extensions import catalog_cache
+
+    client = app.test_client()
+    results = {}
+    for route in routes:
+        for i in range(start, start + warmup):
+            method, path, body, headers = fixtures.request_for(route, i)
+            client.open(path, method=method, json=body, headers=headers)
+
+        latencies, sql_counts, statuses = [], [], Counter()
+        began = time.perf_counter()
+        for i in range(start + warmup, start + warmup + count):
+            method, path, body, headers = fixtures.request_for(route, i)
+            if cold_cache:
+                catalog_cache.bump_version()
+            with record_queries() as queries:
+                t0 = time.perf_counter()
+                response = client.open(path, method=method, json=body, headers=headers)
+                latencies.append(time.perf_counter() - t0)
+            statuses[response.status_code] += 1
+            sql_counts.append(len(queries))
+        results[route[0]] = summarize(latencies, time.perf_counter() - began, statuses, sql_counts)
+        print_route(route[0], results[route[0]])
+    return results
+
+def run_http(app, fixtures, routes, start, count, warmup, concurrency, cold_cache):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from extensions import catalog_cache
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Requests are built up front (token creation needs the app context)
+    def send(request_args):
+        method, path, body, headers = request_args
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(base_url + path, data=data, method=method,
+                                         headers={**headers, 'Content-Type': 'application/json'})
+        if cold_cache:
+            catalog_cache.bump_version()
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            status = e.code
+        return time.perf_counter() - t0, status
+
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for route in routes:
+                warm = [fixtures.request_for(route, i) for i in range(start, start + warmup)]
+                list(pool.map(send, warm))
+                batch = [fixtures.request_for(route, i)
+                         for i in range(start + warmup, start + warmup + count)]
+                began = time.perf_counter()
+                outcomes = list(pool.map(send, batch))
+                elapsed = time.perf_counter() - began
+                statuses = Counter(status for _, status in outcomes)
+                results[route[0]] = summarize([latency for latency, _ in outcomes], elapsed, statuses, None)
+                print_route(route[0], results[route[0]])
+    finally:
+        server.shutdown()
+    return results
+
+def print_route(label, result):
+    latency = result['latency_ms']
+    sql = result.get('sql_statements')
+    print(f"  {label:<24} {result['throughput_rps'] or 0:>9.1f} req/s"
+          f"  p50 {latency['p50']:>8.2f}  p95 {latency['p95']:>8.2f}  p99 {latency['p99']:>8.2f} ms"
+          + (f"  sql {sql['mean']:>5.1f}" if sql else "")
+          + (f"  errors {result['errors']}" if result['errors'] else ""))
+
+def print_comparison(baseline, current):
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for mode, routes in current['results'].items():
+        for label, result in routes.items():
+            before = baseline.get('results', {}).get(mode, {}).get(label)
+            if not before:
+                continue
+            changes = []
+            for key in ('p50', 'p95', 'p99'):
+                old, new = before['latency_ms'][key], result['latency_ms'][key]
+                changes.append(f"{key} {new - old:+8.2f} ms ({(new - old) / old * 100 if old else 0:+6.1f}%)")
+            print(f"  [{mode}] {label:<24} " + "  ".join(changes))
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per route')
+    parser.add_argument('--warmup', type=int, default=10, help='unmeasured requests per route')
+    parser.add_argument('--routes', help='comma separated substrings; only matching routes run')
+    parser.add_argument('--rounds', type=int, default=4, help='bcrypt cost for seeded and new passwords')
+    parser.add_argument('--cold-cache', action='store_true', help='invalidate the catalog cache before each request')
+    parser.add_argument('--http', action='store_true', help='also run against a threaded local HTTP server')
+    parser.add_argument('--concurrency', type=int, default=8, help='HTTP client threads')
+    parser.add_argument('--output', help='results file (default: benchmark-<commit>.json)')
+    parser.add_argument('--compare', help='earlier results file to diff against')
+    args = parser.parse_args(argv)
+
+    routes = ROUTES
+    if args.routes:
+        wanted = [w.strip().lower() for w in args.routes.split(',') if w.strip()]
+        routes = tuple(r for r in ROUTES if any(w in r[0] for w in wanted))
+
+    workdir = tempfile.mkdtemp(prefix='benchmark-')
+
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'benchmark.db')
+        SQLALCHEMY_READ_DATABASE_URI = None
+        UPLOAD_FOLDER = os.path.join(workdir, 'uploads')
+        BCRYPT_LOG_ROUNDS = args.rounds
+        IMAGE_WORKERS = 0
+        # Every request comes from one address; throttling would measure the limiter, not the route
+        RATE_LIMIT_ENABLED = False
+        # Room for every client's hash at once; the default bound is sized from the CPU count
+        # and would shed --http login/register traffic as 503s on small machines
+        PASSWORD_HASH_MAX_PENDING = max(args.concurrency, Config.PASSWORD_HASH_MAX_PENDING or 0)
+
+    from app import create_app
+    from extensions import db
+    from seed import seed_database
+
+    os.makedirs(BenchmarkConfig.UPLOAD_FOLDER, exist_ok=True)
+    app = create_app(BenchmarkConfig)
+    with app.app_context():
+        db.create_all()
+        seeded_at = time.perf_counter()
+        counts = seed_database(products=args.products, users=args.users, rounds=args.rounds)
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+        print(f"Seeded {counts} in {time.perf_counter() - seeded_at:.1f}s")
+
+        fixtures = Fixtures(db, args.products, args.users, args.users // 2)
+        fixtures.cursor = app.test_client().get('/api/products?limit=24').json['next_cursor']
+        per_mode = args.warmup + args.requests
+        needed = per_mode * (2 if args.http else 1)
+        if fixtures.capacity() < needed:
+            parser.error(f"the data set only has room for {fixtures.capacity()} distinct writes per route "
+                         f"but {needed} are needed; raise --users/--products or lower --requests")
+
+        results = {}
+        print("test client:")
+        results['test_client'] = run_test_client(app, fixtures, routes, 0, args.requests,
+                                                 args.warmup, args.cold_cache)
+        if args.http:
+            print(f"http ({args.concurrency} clients):")
+            results['http'] = run_http(app, fixtures, routes, per_mode, args.requests, args.warmup,
+                                       args.concurrency, args.cold_cache)
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'dataset': counts,
+        'options': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'results': results,
+    }
+    output = args.output or f"benchmark-{(commit or 'unknown')[:12]}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), report)
+
+    errors = sum(r['errors'] for mode in results.values() for r in mode.values())
+    return 1 if errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from sqlite_store import SQLiteConnections, sqlite_path
+
+# variants holds encoded copies of body (e.g. gzip), filled in on first use; key is the
+# versioned cache key, so variant sizes can be charged to the entry
+CachedResponse = namedtuple('CachedResponse', ['body', 'etag', 'variants', 'key'])
+
+class LRUCache:
+    # Bounded by entry count and, when sizeof is given, by the total size of the values
+    def __init__(self, maxsize=1024, ttl=None, maxbytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remove(self, key):
+        value, expires_at, size = self._data.pop(key)
+        self.bytes -= size
+        return value
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at, _ = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        size = self.sizeof(value) if self.sizeof else 0
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires_at, size)
+            self.bytes += size
+            self._evict()
+
+    def adjust(self, key, delta):
+        # The value grew (or shrank) in place; no-op if it has been evicted meanwhile
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return
+            value, expires_at, size = item
+            self._data[key] = (value, expires_at, size + delta)
+            self.bytes += delta
+            self._evict()
+
+    def _evict(self):
+        while len(self._data) > self.maxsize or (self.maxbytes and self.bytes > self.maxbytes and self._data):
+            self._remove(next(iter(self._data)))
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            return self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+def _entry_size(entry):
+    return len(entry.body) + sum(len(body) for body in entry.variants.values())
+
+class SharedCatalogVersion:
+    # The catalog generation in a side SQLite file, so a write handled by one worker process
+    # retires the cached responses of all of them
+    SCHEMA = ("CREATE TABLE IF NOT EXISTS catalog_version ("
+              "id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)")
+
+    def __init__(self, path):
+        self.connections = SQLiteConnections(path)
+        connection = self.connections.get()
+        connection.execute(self.SCHEMA)
+        connection.execute("INSERT OR IGNORE INTO catalog_version(id, version) VALUES (1, 0)")
+
+    def current(self):
+        return self.connections.get().execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()[0]
+
+    def bump(self):
+        rows = self.connections.get().execute(
+            "UPDATE catalog_version SET version = version + 1 WHERE id = 1 RETURNING version").fetchall()
+        return rows[0][0]
+
+class CatalogCache:
+    def __init__(self):
+        self.version = 0
+        self.shared = None
+        self.entries = LRUCache(sizeof=_entry_size)
+        self.max_entry_bytes = None
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.entries.maxsize = app.config.get('CATALOG_CACHE_SIZE', 512)
+        self.entries.ttl = app.config.get('CATALOG_CACHE_TTL', 300)
+        self.entries.maxbytes = app.config.get('CATALOG_CACHE_MAX_BYTES')
+        self.max_entry_bytes = app.config.get('CATALOG_CACHE_MAX_ENTRY_BYTES')
+        path = sqlite_path(app.config.get('CATALOG_CACHE_STORAGE'))
+        self.shared = SharedCatalogVersion(path) if path else None
+        if self.shared is not None:
+            self.version = self.shared.current()
+        app.extensions['catalog_cache'] = self
+
+    def current_version(self):
+        # With shared storage this also picks up writes made in other worker processes
+        if self.shared is None:
+            return self.version
+        version = self.shared.current()
+        if version > self.version:
+            self._advance(version)
+        return version
+
+    def _advance(self, version):
+        with self._lock:
+            if version > self.version:
+                self.version = version
+                self.entries.clear()
+
+    def get(self, key, version=None):
+        version = self.current_version() if version is None else version
+        return self.entries.get((version,) + key)
+
+    def set(self, key, body, version=None):
+        # Strong ETag derived from the serialized bytes so it is stable across workers
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        full_key = (self.version if version is None else version,) + key
+        entry = CachedResponse(body, etag, {}, full_key)
+        if self.max_entry_bytes and len(body) > self.max_entry_bytes:
+            # Served, but too large to keep: a few such bodies would crowd out everything else
+            self.skipped += 1
+            return entry
+        self.entries.set(full_key, entry)
+        return entry
+
+    def add_variant(self, entry, encoding, body):
+        # setdefault is atomic, so a variant two threads built at once is charged only once
+        if entry.variants.setdefault(encoding, body) is body:
+            self.entries.adjust(entry.key, len(body))
+
+    def bump_version(self):
+        # Called after every catalog write; entries keyed on older versions become unreachable
+        if self.shared is not None:
+            self._advance(self.shared.bump())
+            return
+        with self._lock:
+            self.version += 1
+            self.entries.clear()
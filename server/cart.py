@@ -0,0 +1,152 @@
+from sqlalchemy import and_, delete, exists, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from extensions import db
+from models import CartItem, Product
+
+CART_OPERATIONS = ('add', 'set', 'remove')
+
+class CartError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+# Stock checks live inside the UPDATE/INSERT statements themselves, so two concurrent
+# requests can never both pass a Python-side comparison and oversell.
+def _stock_for(product_id_column):
+    return select(Product.stock).where(Product.id == product_id_column).scalar_subquery()
+
+def _item_filter(user_id, item_id=None, product_id=None):
+    if item_id is not None:
+        return and_(CartItem.id == item_id, CartItem.user_id == user_id)
+    return and_(CartItem.product_id == product_id, CartItem.user_id == user_id)
+
+def _execute(statement):
+    return db.session.execute(statement.execution_options(synchronize_session=False))
+
+def _diagnose(user_id, item_id=None, product_id=None, quantity=None):
+    # Only runs after a conditional statement matched nothing, to explain why
+    if item_id is not None:
+        row = db.session.execute(
+            select(CartItem.user_id, CartItem.quantity, Product.stock)
+            .join(Product, Product.id == CartItem.product_id)
+            .where(CartItem.id == item_id)).first()
+        if row is None:
+            raise CartError("Cart item not found", 404)
+        if row.user_id != user_id:
+            raise CartError("Unauthorized", 403)
+        raise CartError(f"Not enough stock available ({row.stock} left)")
+
+    stock = db.session.execute(select(Product.stock).where(Product.id == product_id)).scalar()
+    if stock is None:
+        raise CartError("Product not found", 404)
+    if quantity is not None and quantity > 0:
+        raise CartError("Not enough stock available")
+    raise CartError("Item not in cart", 404)
+
+def _add_to_existing(user_id, product_id, quantity):
+    result = _execute(
+        update(CartItem)
+        .where(_item_filter(user_id, product_id=product_id),
+               CartItem.quantity + quantity <= _stock_for(CartItem.product_id))
+        .values(quantity=CartItem.quantity + quantity))
+    return result.rowcount > 0
+
+def add_item(user_id, product_id, quantity):
+    if _add_to_existing(user_id, product_id, quantity):
+        return
+
+    already_in_cart = exists().where(_item_filter(user_id, product_id=product_id))
+    try:
+        # In a savepoint, so losing the race below rolls back the insert and nothing else
+        # the caller's transaction has done
+        with db.session.begin_nested():
+            result = _execute(
+                insert(CartItem).from_select(
+                    ['user_id', 'product_id', 'quantity'],
+                    select(literal(user_id), Product.id, literal(quantity))
+                    .where(Product.id == product_id, Product.stock >= quantity, ~already_in_cart)))
+            inserted = result.rowcount > 0
+    except IntegrityError:
+        # A concurrent request inserted the same line after our check; add to that one instead
+        inserted = _add_to_existing(user_id, product_id, quantity)
+    if not inserted:
+        _diagnose(user_id, product_id=product_id, quantity=quantity)
+
+def set_quantity(user_id, quantity, item_id=None, product_id=None):
+    result = _execute(
+        update(CartItem)
+        .where(_item_filter(user_id, item_id, product_id),
+               literal(quantity) <= _stock_for(CartItem.product_id))
+        .values(quantity=quantity))
+    if not result.rowcount:
+        if item_id is not None:
+            _diagnose(user_id, item_id=item_id)
+        in_cart = db.session.execute(
+            select(CartItem.id).where(_item_filter(user_id, product_id=product_id))).first()
+        _diagnose(user_id, product_id=product_id, quantity=quantity if in_cart else None)
+
+def remove_item(user_id, item_id=None, product_id=None):
+    result = _execute(delete(CartItem).where(_item_filter(user_id, item_id, product_id)))
+    if not result.rowcount:
+        if item_id is not None:
+            _diagnose(user_id, item_id=item_id)
+        raise CartError("Item not in cart", 404)
+
+def _parse_operation(operation):
+    if not isinstance(operation, dict) or operation.get('op') not in CART_OPERATIONS:
+        raise CartError(f"Each operation needs an 'op' of {', '.join(CART_OPERATIONS)}")
+    item_id = operation.get('item_id')
+    product_id = operation.get('product_id')
+    if not isinstance(item_id, int) and not isinstance(product_id, int):
+        raise CartError("Each operation needs an integer 'item_id' or 'product_id'")
+    if operation['op'] == 'add' and not isinstance(product_id, int):
+        raise CartError("'add' operations need a 'product_id'")
+    quantity = operation.get('quantity', 1 if operation['op'] == 'add' else None)
+    if operation['op'] != 'remove' and (not isinstance(quantity, int) or quantity < 1):
+        raise CartError("Invalid quantity provided")
+    return operation['op'], item_id if isinstance(item_id, int) else None, product_id, quantity
+
+def apply_operations(user_id, operations):
+    # Caller owns the transaction: commit on success, roll back on CartError
+    for index, operation in enumerate(operations):
+        try:
+            op, item_id, product_id, quantity = _parse_operation(operation)
+            if op == 'add':
+                add_item(user_id, product_id, quantity)
+            elif op == 'set':
+                set_quantity(user_id, quantity, item_id=item_id, product_id=product_id)
+            else:
+                remove_item(user_id, item_id=item_id, product_id=product_id)
+        except CartError as e:
+            e.operation_index = index
+            raise
+
+def load_cart(user_id):
+    return (CartItem.query.options(joinedload(CartItem.product))
+            .filter_by(user_id=user_id).all())
+
+def load_cart_item(user_id, item_id=None, product_id=None):
+    return (CartItem.query.options(joinedload(CartItem.product))
+            .filter(_item_filter(user_id, item_id, product_id)).first())
+
+def load_cart_lines(user_id):
+    # Compact cart: ids and quantities only, no product rows
+    rows = db.session.execute(
+        select(CartItem.id, CartItem.product_id, CartItem.quantity)
+        .where(CartItem.user_id == user_id)
+        .order_by(CartItem.id)
+    ).all()
+    return [{'id': row.id, 'product_id': row.product_id, 'quantity': row.quantity} for row in rows]
+
+def cart_summary(user_id):
+    # Totals are computed by the database, so no product rows are loaded
+    item_count, quantity, total = db.session.execute(
+        select(func.count(CartItem.id),
+               func.coalesce(func.sum(CartItem.quantity), 0),
+               func.coalesce(func.sum(CartItem.quantity * Product.price), 0))
+        .join(Product, Product.id == CartItem.product_id)
+        .where(CartItem.user_id == user_id)
+    ).one()
+    return {'item_count': item_count, 'quantity': quantity, 'total': round(total, 2)}
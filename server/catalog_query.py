@@ -0,0 +1,155 @@
+import base64
+import json
+import math
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func, select, tuple_
+from models import Product
+
+PRODUCT_FIELDS = ('id', 'name', 'description', 'price', 'stock', 'image_url', 'date_added', 'category')
+
+# sort key -> (column, ascending); every sort is made total by breaking ties on id
+SORT_OPTIONS = {
+    'newest': ('date_added', False),
+    'oldest': ('date_added', True),
+    'price_asc': ('price', True),
+    'price_desc': ('price', False),
+    'name': ('name', True),
+}
+DEFAULT_SORT = 'newest'
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+FALSE_VALUES = ('0', 'false', 'no', 'off')
+# Query parameters parse_catalog_filters understands
+FILTER_KEYS = ('category', 'price_min', 'price_max', 'in_stock', 'added_after', 'added_before')
+
+def parse_fields(raw_fields):
+    if not raw_fields:
+        return PRODUCT_FIELDS
+    fields = tuple(dict.fromkeys(f.strip() for f in raw_fields.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in PRODUCT_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Unknown fields requested: {', '.join(unknown) or raw_fields}")
+    return fields
+
+def parse_limit(raw_limit):
+    if raw_limit is None:
+        return current_app.config['PRODUCTS_DEFAULT_PAGE_SIZE']
+    try:
+        limit = int(raw_limit)
+    except (ValueError, TypeError):
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    return min(limit, current_app.config['PRODUCTS_MAX_PAGE_SIZE'])
+
+def parse_sort(raw_sort):
+    sort = raw_sort or DEFAULT_SORT
+    if sort not in SORT_OPTIONS:
+        raise ValueError(f"Unknown sort '{sort}'. Use one of: {', '.join(SORT_OPTIONS)}")
+    return sort
+
+def _parse_number(args, name):
+    raw = args.get(name)
+    if raw in (None, ''):
+        return None
+    try:
+        value = float(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+    # float() also accepts nan and inf, which would only match nothing and fill the cache
+    if not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number")
+    if value < 0:
+        raise ValueError(f"{name} cannot be negative")
+    return value
+
+def _parse_datetime(args, name):
+    raw = args.get(name)
+    if raw in (None, ''):
+        return None
+    try:
+        return datetime.fromisoformat(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO-8601 date or datetime")
+
+def parse_catalog_filters(args):
+    # category may be repeated or comma separated; 'All' means no category filter
+    categories = []
+    for raw in args.getlist('category'):
+        categories.extend(c.strip() for c in raw.split(',') if c.strip())
+    categories = tuple(sorted(set(categories) - {'All'}))
+
+    filters = {
+        'categories': categories,
+        'price_min': _parse_number(args, 'price_min'),
+        'price_max': _parse_number(args, 'price_max'),
+        'in_stock': (args.get('in_stock') or '').lower() in TRUE_VALUES,
+        'added_after': _parse_datetime(args, 'added_after'),
+        'added_before': _parse_datetime(args, 'added_before'),
+    }
+    if filters['price_min'] is not None and filters['price_max'] is not None \
+            and filters['price_min'] > filters['price_max']:
+        raise ValueError("price_min cannot be greater than price_max")
+    return filters
+
+def filter_conditions(filters):
+    conditions = []
+    if len(filters['categories']) == 1:
+        conditions.append(Product.category == filters['categories'][0])
+    elif filters['categories']:
+        conditions.append(Product.category.in_(filters['categories']))
+    if filters['price_min'] is not None:
+        conditions.append(Product.price >= filters['price_min'])
+    if filters['price_max'] is not None:
+        conditions.append(Product.price <= filters['price_max'])
+    if filters['in_stock']:
+        conditions.append(Product.stock > 0)
+    if filters['added_after'] is not None:
+        conditions.append(Product.date_added >= filters['added_after'])
+    if filters['added_before'] is not None:
+        conditions.append(Product.date_added < filters['added_before'])
+    return conditions
+
+def encode_cursor(sort, value, product_id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, product_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token, sort):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        cursor_sort, value, product_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if cursor_sort != sort:
+            raise ValueError
+        if SORT_OPTIONS[sort][0] == 'date_added':
+            value = datetime.fromisoformat(value)
+        return value, int(product_id)
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid pagination cursor")
+
+def build_catalog_query(columns, filters, sort=None, cursor=None, limit=None):
+    query = select(*columns).where(*filter_conditions(filters))
+    if sort is None:
+        return query
+
+    column_name, ascending = SORT_OPTIONS[sort]
+    sort_column = getattr(Product, column_name)
+    if ascending:
+        query = query.order_by(sort_column.asc(), Product.id.asc())
+    else:
+        query = query.order_by(sort_column.desc(), Product.id.desc())
+
+    if cursor is not None:
+        keyset = tuple_(sort_column, Product.id)
+        query = query.where(keyset > cursor if ascending else keyset < cursor)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+def build_count_query(filters):
+    return select(func.count(Product.id)).where(*filter_conditions(filters))
+
+def sort_value(row, sort):
+    return getattr(row, SORT_OPTIONS[sort][0])
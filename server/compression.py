@@ -0,0 +1,106 @@
+import gzip
+import threading
+import zlib
+from flask import request
+
+# Preferred first when the client weights several encodings equally
+ENCODINGS = ('gzip', 'deflate')
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'application/json', 'application/javascript', 'text/html', 'text/plain', 'text/css',
+    'text/csv', 'image/svg+xml',
+})
+# No body, or a body whose bytes must not change
+_SKIP_STATUSES = frozenset({204, 206, 304})
+
+def compress(data, encoding, level):
+    if encoding == 'gzip':
+        # mtime=0 keeps the output, and anything hashed from it, identical across workers
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    # HTTP "deflate" is the zlib format, not raw deflate
+    return zlib.compress(data, level)
+
+class ResponseCompressor:
+    def __init__(self):
+        self.enabled = True
+        self.min_size = 1024
+        self.level = 6
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.reused = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESSION_ENABLED', True)
+        self.min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+        self.level = app.config.get('COMPRESSION_LEVEL', 6)
+        app.extensions['response_compressor'] = self
+        if self.enabled:
+            app.after_request(self._compress_response)
+
+    def negotiate(self):
+        if not self.enabled:
+            return None
+        accepted = request.accept_encodings
+        best, best_quality = None, 0
+        for encoding in ENCODINGS:
+            quality = accepted.quality(encoding)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def _record(self, size_in, size_out, reused=False):
+        with self._lock:
+            if reused:
+                self.reused += 1
+            else:
+                self.compressed += 1
+            self.bytes_in += size_in
+            self.bytes_out += size_out
+
+    def cached_body(self, entry, encoding, cache):
+        # Compressed variants live on the cache entry, so each is built once per entry
+        if encoding is None or len(entry.body) < self.min_size:
+            return entry.body, None
+        body = entry.variants.get(encoding)
+        if body is None:
+            # Two threads may both compress on a miss; the results are identical
+            body = compress(entry.body, encoding, self.level)
+            cache.add_variant(entry, encoding, body)
+            self._record(len(entry.body), len(body))
+        else:
+            self._record(len(entry.body), len(body), reused=True)
+        return body, encoding
+
+    def _compress_response(self, response):
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        response.vary.add('Accept-Encoding')
+        # Streamed bodies and files sent straight from disk are left alone
+        if (response.is_streamed or response.direct_passthrough or 'Content-Encoding' in response.headers
+                or response.status_code in _SKIP_STATUSES or request.method == 'HEAD'):
+            return response
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        body = compress(data, encoding, self.level)
+        self._record(len(data), len(body))
+        response.set_data(body)
+        response.content_encoding = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            # A strong ETag names one exact byte sequence; the compressed one needs its own
+            response.set_etag(f"{etag}-{encoding}", weak)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                'compressed': self.compressed,
+                'reused': self.reused,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+            }
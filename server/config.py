@@ -11,6 +11,117 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'ecommerce.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
-    UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
+    # Optional read-only bind for catalog traffic, e.g.
+    # sqlite:///file:/path/to/ecommerce.db?mode=ro&uri=true
+    SQLALCHEMY_READ_DATABASE_URI = os.environ.get('DATABASE_READ_URL')
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        key: int(os.environ[env_var])
+        for key, env_var in (('pool_size', 'DB_POOL_SIZE'),
+                             ('max_overflow', 'DB_MAX_OVERFLOW'),
+                             ('pool_timeout', 'DB_POOL_TIMEOUT'),
+                             ('pool_recycle', 'DB_POOL_RECYCLE'))
+        if os.environ.get(env_var)
+    }
+    # Applied to every new SQLite connection
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024)) * -1,
+        # SQLite leaves foreign keys unenforced unless asked; product deletes rely on ON DELETE CASCADE
+        'foreign_keys': 'ON',
+    }
 
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
\ No newline at end of file
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(basedir, 'uploads')
+
+    UPLOAD_CACHE_MAX_AGE = int(os.environ.get('UPLOAD_CACHE_MAX_AGE', 31536000))
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+    # Image files of deleted products are removed by a background thread; 0 removes them inline
+    UPLOAD_CLEANUP_WORKERS = int(os.environ.get('UPLOAD_CLEANUP_WORKERS', 1))
+    BULK_DELETE_MAX_IDS = int(os.environ.get('BULK_DELETE_MAX_IDS', 10000))
+
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+    IMPORT_MAX_REPORTED_ERRORS = int(os.environ.get('IMPORT_MAX_REPORTED_ERRORS', 1000))
+    # Rows fetched per round trip by the streaming admin exports
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+    PRODUCTS_DEFAULT_PAGE_SIZE = int(os.environ.get('PRODUCTS_DEFAULT_PAGE_SIZE', 24))
+    PRODUCTS_MAX_PAGE_SIZE = int(os.environ.get('PRODUCTS_MAX_PAGE_SIZE', 100))
+
+    CATALOG_CACHE_SIZE = int(os.environ.get('CATALOG_CACHE_SIZE', 512))
+    CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL', 300))
+    # Total bytes of cached bodies, compressed copies included; larger bodies are served uncached
+    CATALOG_CACHE_MAX_BYTES = int(os.environ.get('CATALOG_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    CATALOG_CACHE_MAX_ENTRY_BYTES = int(os.environ.get('CATALOG_CACHE_MAX_ENTRY_BYTES', 4 * 1024 * 1024))
+    # Where the catalog generation lives. 'memory' means a write only retires the cached
+    # responses of the worker that handled it, so serve.py refuses more than one worker with it.
+    CATALOG_CACHE_STORAGE = os.environ.get('CATALOG_CACHE_STORAGE', 'memory')
+    # Origin put in front of /uploads/... image URLs (e.g. https://cdn.example.com). Empty
+    # gives root-relative URLs, which clients resolve against the API's origin.
+    PUBLIC_ASSET_URL = os.environ.get('PUBLIC_ASSET_URL', '')
+
+    # gzip/deflate for JSON and text responses; bodies smaller than COMPRESSION_MIN_SIZE
+    # bytes are sent as-is. Cached catalog responses keep their compressed bytes.
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', '1') != '0'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))
+
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 0)) or None
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+    PASSWORD_HASH_RETRY_AFTER = int(os.environ.get('PASSWORD_HASH_RETRY_AFTER', 1))
+
+    ADMIN_STATUS_CACHE_TTL = int(os.environ.get('ADMIN_STATUS_CACHE_TTL', 60))
+    # Where logouts (revoked tokens) and admin demotions are recorded. 'memory' is seen by
+    # this process only, so serve.py refuses more than one worker with it; multi-worker
+    # deployments set sqlite:///path to a file every worker can open.
+    AUTH_STATE_STORAGE = os.environ.get('AUTH_STATE_STORAGE', 'memory')
+
+    # Number of reverse proxies in front of the app. When set, the client address (and scheme)
+    # are taken from that many X-Forwarded-For/-Proto hops; leave at 0 when clients connect
+    # directly, or anyone could pick their own address by sending the header.
+    TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+
+    # Token buckets checked before the view runs, so throttled logins never reach bcrypt.
+    # Rules are "scope:count/period" (period second/minute/hour/day). Scopes: ip (the client
+    # address, see TRUSTED_PROXY_COUNT), email (the account named in a login/register body)
+    # and account (the user of the request's token).
+    # RATE_LIMIT_WRITE covers any POST/PUT/PATCH/DELETE endpoint not listed in RATE_LIMITS.
+    # sqlite:///path shares the buckets between worker processes; memory is per process.
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') != '0'
+    RATE_LIMIT_STORAGE = os.environ.get('RATE_LIMIT_STORAGE', 'memory')
+    RATE_LIMIT_LOGIN = os.environ.get('RATE_LIMIT_LOGIN', 'ip:30/minute email:5/minute')
+    RATE_LIMIT_REGISTER = os.environ.get('RATE_LIMIT_REGISTER', 'ip:10/minute email:3/minute')
+    RATE_LIMIT_WRITE = os.environ.get('RATE_LIMIT_WRITE', 'ip:300/minute account:120/minute')
+    RATE_LIMITS = {
+        'user_api.user_login': RATE_LIMIT_LOGIN,
+        'user_api.admin_login': RATE_LIMIT_LOGIN,
+        'user_api.register': RATE_LIMIT_REGISTER,
+    }
+    # Endpoints in one group draw from the same buckets, so alternating between the user and
+    # admin login forms does not double the guesses allowed per email
+    RATE_LIMIT_GROUPS = {
+        'user_api.user_login': 'login',
+        'user_api.admin_login': 'login',
+    }
+
+    CART_MAX_OPERATIONS = int(os.environ.get('CART_MAX_OPERATIONS', 100))
+
+    SQL_QUERY_BUDGET_ENFORCE = os.environ.get('SQL_QUERY_BUDGET_ENFORCE') == '1'
+
+    # Logs are queued and written by a background thread; LOG_LEVELS overrides single
+    # loggers, e.g. "sqlalchemy.engine=INFO,werkzeug=WARNING"
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+    # Fraction of DEBUG records that are kept; INFO and above are never sampled
+    LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 0.01))
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+
+    # Per-endpoint request metrics served at /api/admin/metrics
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+    # Requests slower than this (seconds) are logged with their SQL; 0 disables the slow log
+    SLOW_REQUEST_THRESHOLD = float(os.environ.get('SLOW_REQUEST_THRESHOLD', 1.0))
+    SLOW_REQUEST_LOG_SIZE = int(os.environ.get('SLOW_REQUEST_LOG_SIZE', 20))
\ No newline at end of file
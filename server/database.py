@@ -0,0 +1,45 @@
+from sqlalchemy import event
+from extensions import db
+
+CATALOG_READ_BIND = 'catalog_read'
+
+# Pragmas that only make sense on a connection that is allowed to write
+WRITE_ONLY_PRAGMAS = ('journal_mode',)
+
+def configure_binds(app):
+    # Must run before db.init_app so Flask-SQLAlchemy creates the extra engine
+    read_uri = app.config.get('SQLALCHEMY_READ_DATABASE_URI')
+    if read_uri:
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds.setdefault(CATALOG_READ_BIND, read_uri)
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+def _sqlite_pragma_listener(pragmas, read_only):
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                if read_only and name in WRITE_ONLY_PRAGMAS:
+                    continue
+                cursor.execute(f"PRAGMA {name}={value}")
+            if read_only:
+                cursor.execute("PRAGMA query_only=ON")
+        finally:
+            cursor.close()
+    return apply_pragmas
+
+def init_engine_profile(app):
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            if engine.dialect.name != 'sqlite':
+                continue
+            listener = _sqlite_pragma_listener(pragmas, read_only=bind_key == CATALOG_READ_BIND)
+            event.listen(engine, 'connect', listener)
+
+def read_bind():
+    # Catalog reads go to the read-only engine when one is configured
+    return db.engines.get(CATALOG_READ_BIND, db.engine)
+
+def execute_read(statement, params=None):
+    return db.session.execute(statement, params, bind_arguments={'bind': read_bind()})
@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import select
+from models import CartItem, Product, User, WishlistItem
+from database import read_bind
+
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+# Column lists are explicit so exports never include password hashes and never load ORM objects
+EXPORT_DATASETS = {
+    'users': lambda: select(User.id, User.email, User.is_admin).order_by(User.id),
+    'products': lambda: select(Product.id, Product.name, Product.description, Product.price, Product.stock,
+                               Product.category, Product.image_url, Product.date_added).order_by(Product.id),
+    'carts': lambda: (select(CartItem.id, CartItem.user_id, User.email.label('user_email'), CartItem.product_id,
+                             Product.name.label('product_name'), Product.price, CartItem.quantity)
+                      .join(User, CartItem.user_id == User.id)
+                      .join(Product, CartItem.product_id == Product.id)
+                      .order_by(CartItem.user_id, CartItem.id)),
+    'wishlists': lambda: (select(WishlistItem.id, WishlistItem.user_id, User.email.label('user_email'),
+                                 WishlistItem.product_id, Product.name.label('product_name'))
+                          .join(User, WishlistItem.user_id == User.id)
+                          .join(Product, WishlistItem.product_id == Product.id)
+                          .order_by(WishlistItem.user_id, WishlistItem.id)),
+}
+
+# Leading characters spreadsheet applications would evaluate as a formula
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def _csv_cell(value):
+    value = _plain(value)
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def stream_export(dataset, export_format, batch_size=1000):
+    # Generator: one chunk per batch of rows, read through a streaming cursor on its own
+    # connection so neither the rows nor the output are ever held in full
+    statement = EXPORT_DATASETS[dataset]()
+    with read_bind().connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=batch_size).execute(statement)
+        columns = list(result.keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if export_format == 'csv' else None
+        if writer:
+            writer.writerow(columns)
+            # The header goes out before the first batch is read
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        for rows in result.partitions():
+            if writer:
+                writer.writerows([_csv_cell(value) for value in row] for row in rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps({column: _plain(value) for column, value in zip(columns, row)}))
+                    buffer.write('\n')
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
@@ -1,11 +1,21 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
-from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+from cache import CatalogCache
+from hashing import PasswordHasher
+from images import ImageProcessor
+from metrics import RequestMetrics
+from logging_setup import LogPipeline
+from compression import ResponseCompressor
+from ratelimit import RateLimiter
 
 db = SQLAlchemy()
-bcrypt = Bcrypt()
-migrate = Migrate()
 jwt = JWTManager()
-cors = CORS()
\ No newline at end of file
+cors = CORS()
+catalog_cache = CatalogCache()
+password_hasher = PasswordHasher()
+image_processor = ImageProcessor()
+request_metrics = RequestMetrics()
+log_pipeline = LogPipeline()
+response_compressor = ResponseCompressor()
+rate_limiter = RateLimiter()
\ No newline at end of file
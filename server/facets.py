@@ -0,0 +1,105 @@
+from flask.cli import AppGroup
+from sqlalchemy import case, event, func, select
+from sqlalchemy.exc import OperationalError
+from extensions import db
+from models import CategoryFacet, Product
+from database import execute_read
+
+FACET_TABLE = CategoryFacet.__tablename__
+
+class FacetsUnavailable(Exception):
+    pass
+
+# Keep category_facet in step with product. Counts move by one per row; a min/max
+# is only recomputed when the row that held it leaves the category, and then via
+# the (category, price) index, so every trigger is O(log n).
+_ADD_ROW = f"""
+        INSERT INTO {FACET_TABLE}(category, product_count, in_stock_count, min_price, max_price)
+        SELECT new.category, 1, new.stock > 0, new.price, new.price WHERE new.category IS NOT NULL
+        ON CONFLICT(category) DO UPDATE SET
+            product_count = product_count + 1,
+            in_stock_count = in_stock_count + excluded.in_stock_count,
+            min_price = min(min_price, excluded.min_price),
+            max_price = max(max_price, excluded.max_price);"""
+
+_REMOVE_ROW = f"""
+        UPDATE {FACET_TABLE} SET
+            product_count = product_count - 1,
+            in_stock_count = in_stock_count - (old.stock > 0),
+            min_price = CASE WHEN old.price <= min_price
+                THEN (SELECT MIN(price) FROM product WHERE category = old.category) ELSE min_price END,
+            max_price = CASE WHEN old.price >= max_price
+                THEN (SELECT MAX(price) FROM product WHERE category = old.category) ELSE max_price END
+        WHERE category = old.category;
+        DELETE FROM {FACET_TABLE} WHERE category = old.category AND product_count <= 0;"""
+
+FACET_TRIGGERS_DDL = (
+    f"""CREATE TRIGGER IF NOT EXISTS category_facet_ai AFTER INSERT ON product BEGIN{_ADD_ROW}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS category_facet_ad AFTER DELETE ON product BEGIN{_REMOVE_ROW}
+    END""",
+    # The product row already holds the new values here, which is what the
+    # MIN/MAX lookups in _REMOVE_ROW must see
+    f"""CREATE TRIGGER IF NOT EXISTS category_facet_au AFTER UPDATE OF category, price, stock ON product BEGIN{_REMOVE_ROW}{_ADD_ROW}
+    END""",
+)
+
+def install_facet_triggers(connection):
+    if connection.dialect.name != 'sqlite':
+        return
+    for statement in FACET_TRIGGERS_DDL:
+        connection.exec_driver_sql(statement)
+
+def facet_aggregate_query():
+    return (select(Product.category,
+                   func.count(Product.id),
+                   func.coalesce(func.sum(case((Product.stock > 0, 1), else_=0)), 0),
+                   func.min(Product.price),
+                   func.max(Product.price))
+            .where(Product.category.is_not(None))
+            .group_by(Product.category))
+
+def rebuild_facets(connection):
+    install_facet_triggers(connection)
+    connection.execute(CategoryFacet.__table__.delete())
+    connection.execute(CategoryFacet.__table__.insert().from_select(
+        ['category', 'product_count', 'in_stock_count', 'min_price', 'max_price'],
+        facet_aggregate_query()))
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_facet_triggers(target, connection, **kw):
+    # Registered on the metadata so both product and category_facet exist by now
+    install_facet_triggers(connection)
+
+def load_facets():
+    if db.engine.dialect.name != 'sqlite':
+        # No triggers elsewhere; aggregate on the fly
+        rows = execute_read(facet_aggregate_query().order_by(Product.category)).all()
+        return [{'category': category, 'product_count': count, 'in_stock_count': in_stock,
+                 'min_price': min_price, 'max_price': max_price}
+                for category, count, in_stock, min_price, max_price in rows]
+    try:
+        facets = execute_read(select(CategoryFacet).order_by(CategoryFacet.category)).scalars()
+        return [facet.to_dict() for facet in facets]
+    except OperationalError as e:
+        # A database the facet migration has not been applied to yet
+        if f'no such table: {FACET_TABLE}' in str(e) or 'no such column' in str(e):
+            db.session.rollback()
+            raise FacetsUnavailable("Category facets have not been built")
+        raise
+
+def facet_totals(facets):
+    return {
+        'product_count': sum(f['product_count'] for f in facets),
+        'in_stock_count': sum(f['in_stock_count'] for f in facets),
+        'min_price': min((f['min_price'] for f in facets), default=None),
+        'max_price': max((f['max_price'] for f in facets), default=None),
+    }
+
+facets_cli = AppGroup('facets', help='Manage the category facet summary table.')
+
+@facets_cli.command('rebuild')
+def rebuild_command():
+    with db.engine.begin() as connection:
+        rebuild_facets(connection)
+    print("Category facets rebuilt.")
@@ -0,0 +1,122 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+class HashingBusy(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Password hashing capacity exhausted")
+        self.retry_after = retry_after
+
+# Module-level so they can be pickled into the worker processes
+def _hash_password(password, rounds):
+    import bcrypt
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _check_password(password_hash, password):
+    import bcrypt
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    except ValueError:
+        return False
+
+def hash_rounds(password_hash):
+    # bcrypt hashes look like $2b$<cost>$<salt+digest>
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+class PasswordHasher:
+    def __init__(self):
+        self.rounds = 12
+        self.workers = 0
+        self.max_pending = 1
+        self.timeout = None
+        self.retry_after = 1
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(1)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._latency_sum = 0.0
+        self._latency_max = 0.0
+
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1))
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING') or max(1, self.workers) * 4
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT')
+        self.retry_after = app.config.get('PASSWORD_HASH_RETRY_AFTER', 1)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        app.extensions['password_hasher'] = self
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn keeps the workers free of the web process's threads and DB connections
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                         mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def _run(self, fn, *args):
+        # Bounded queue: reject immediately instead of letting logins pile up behind each other
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HashingBusy(self.retry_after)
+
+        with self._lock:
+            self._pending += 1
+        started = time.perf_counter()
+        if self.workers <= 0:
+            try:
+                return fn(*args)
+            finally:
+                self._finish(started)
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._finish(started)
+            raise
+        # The slot is held until the job itself ends, not until this caller stops waiting,
+        # so timed-out jobs still count against max_pending while a worker runs them
+        future.add_done_callback(lambda _: self._finish(started))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # A job that never started is dropped and frees its slot now; a running one keeps it
+            future.cancel()
+            raise HashingBusy(self.retry_after)
+
+    def _finish(self, started):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+            self._latency_sum += elapsed
+            self._latency_max = max(self._latency_max, elapsed)
+        self._slots.release()
+
+    def generate_password_hash(self, password):
+        return self._run(_hash_password, password, self.rounds)
+
+    def check_password_hash(self, password_hash, password):
+        return self._run(_check_password, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return hash_rounds(password_hash) != self.rounds
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self._pending,
+                'queue_capacity': self.max_pending,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'latency_seconds_sum': self._latency_sum,
+                'latency_seconds_max': self._latency_max,
+            }
@@ -0,0 +1,142 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+from flask import current_app, url_for
+from flask.cli import AppGroup
+
+# Longest edge in pixels for each derivative
+IMAGE_VARIANTS = {'thumbnail': 160, 'card': 480, 'detail': 1200}
+VARIANT_FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 4}),
+                   'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True})}
+VARIANT_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+ORIGINAL_EXTENSIONS = ('png', 'jpg', 'jpeg', 'webp')
+
+def variant_filename(filename, variant, fmt):
+    stem = filename.rsplit('.', 1)[0]
+    return f"{stem}_{variant}.{VARIANT_EXTENSIONS[fmt]}"
+
+def image_variant_filenames(filename):
+    if not filename:
+        return None
+    return {variant: {fmt: variant_filename(filename, variant, fmt) for fmt in VARIANT_FORMATS}
+            for variant in IMAGE_VARIANTS}
+
+def upload_url_prefix():
+    # Build the uploads URL once per response instead of once per product. It never depends
+    # on the request's Host header, so cached bodies are the same for every client.
+    return current_app.config.get('PUBLIC_ASSET_URL', '').rstrip('/') + url_for('serve_upload', filename='_')[:-1]
+
+def expand_image_urls(prod_dict, url_prefix):
+    # Every product serializer goes through here, so no response carries bare filenames
+    filename = prod_dict.get('image_url')
+    if not filename:
+        return prod_dict
+    prod_dict['image_url'] = url_prefix + quote(filename)
+    variants = {variant: {fmt: url_prefix + quote(name) for fmt, name in formats.items()}
+                for variant, formats in image_variant_filenames(filename).items()}
+    prod_dict['image_variants'] = variants
+    prod_dict['srcset'] = ', '.join(f"{variants[variant]['webp']} {edge}w"
+                                    for variant, edge in IMAGE_VARIANTS.items())
+    return prod_dict
+
+def original_for_variant(filename, upload_folder):
+    # Maps "<stem>_<variant>.<ext>" back to the uploaded original, if there is one
+    stem = filename.rsplit('.', 1)[0]
+    for variant in IMAGE_VARIANTS:
+        suffix = f"_{variant}"
+        if stem.endswith(suffix):
+            original_stem = stem[:-len(suffix)]
+            for ext in ORIGINAL_EXTENSIONS:
+                candidate = f"{original_stem}.{ext}"
+                if os.path.exists(os.path.join(upload_folder, candidate)):
+                    return candidate
+    return None
+
+def _flatten(image):
+    from PIL import Image
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+def generate_variants(filename, upload_folder):
+    from PIL import Image, ImageOps
+
+    source_path = os.path.join(upload_folder, filename)
+    with Image.open(source_path) as source:
+        # Bake EXIF orientation into the pixels; metadata is not copied to the derivatives
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+        written = []
+        for variant, edge in IMAGE_VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail((edge, edge), Image.LANCZOS)
+            for fmt, (pil_format, options) in VARIANT_FORMATS.items():
+                target = os.path.join(upload_folder, variant_filename(filename, variant, fmt))
+                output = resized if fmt == 'webp' else _flatten(resized)
+                tmp_path = f"{target}.tmp"
+                output.save(tmp_path, pil_format, **options)
+                os.replace(tmp_path, target)
+                written.append(target)
+    return written
+
+def remove_variants(filename, upload_folder):
+    for formats in (image_variant_filenames(filename) or {}).values():
+        for variant_name in formats.values():
+            path = os.path.join(upload_folder, variant_name)
+            if os.path.exists(path):
+                os.remove(path)
+
+class ImageProcessor:
+    def __init__(self):
+        self.workers = 2
+        self._executor = None
+        self._lock = threading.Lock()
+        self.logger = None
+
+    def init_app(self, app):
+        self.workers = app.config.get('IMAGE_WORKERS', 2)
+        self.logger = app.logger
+        app.extensions['image_processor'] = self
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='image-worker')
+        return self._executor
+
+    def _process(self, filename, upload_folder):
+        try:
+            generate_variants(filename, upload_folder)
+        except Exception as e:
+            # The original keeps being served in place of the missing derivatives
+            if self.logger:
+                self.logger.warning("Could not generate image variants for %s: %s", filename, e)
+
+    def submit(self, filename, upload_folder=None):
+        upload_folder = upload_folder or current_app.config['UPLOAD_FOLDER']
+        if self.workers <= 0:
+            return self._process(filename, upload_folder)
+        return self._get_executor().submit(self._process, filename, upload_folder)
+
+images_cli = AppGroup('images', help='Manage product image derivatives.')
+
+@images_cli.command('rebuild')
+def rebuild_command():
+    from models import Product
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    filenames = [row.image_url for row in Product.query.with_entities(Product.image_url)
+                 .filter(Product.image_url.isnot(None)).distinct()]
+    for filename in filenames:
+        try:
+            generate_variants(filename, upload_folder)
+        except Exception as e:
+            print(f"Skipped {filename}: {e}")
+    print(f"Processed {len(filenames)} images.")
@@ -0,0 +1,159 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from flask import g, has_request_context, request
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+_REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+
+# Attributes every LogRecord has; anything else was passed through extra= and is emitted as a field
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+def current_request_id():
+    if has_request_context():
+        return g.get('request_id', '-')
+    return '-'
+
+class DebugSampler(logging.Filter):
+    # Keeps roughly `rate` of DEBUG records; everything at INFO and above always passes
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return self.rate > 0 and random.random() < self.rate
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    # A full queue drops the record instead of blocking the request thread
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Everything that depends on the calling thread is resolved here; the writer thread
+        # only formats plain values
+        record = copy.copy(record)
+        record.request_id = current_request_id()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS and not k.startswith('_')}
+        if fields:
+            line += ' ' + ' '.join(f'{k}={v}' for k, v in fields.items())
+        return line
+
+class LogPipeline:
+    def __init__(self):
+        self.handler = None
+        self.listener = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        config = app.config
+        with self._lock:
+            if self.listener is None:
+                self._configure(config)
+        app.extensions['log_pipeline'] = self
+        self._configure_levels(config)
+
+        @app.before_request
+        def assign_request_id():
+            incoming = request.headers.get(REQUEST_ID_HEADER, '')
+            g.request_id = incoming if _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+
+        @app.after_request
+        def echo_request_id(response):
+            if 'request_id' in g:
+                response.headers[REQUEST_ID_HEADER] = g.request_id
+            return response
+
+    def _configure(self, config):
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(JsonFormatter() if config.get('LOG_FORMAT', 'json') == 'json' else TextFormatter())
+
+        self.handler = NonBlockingQueueHandler(queue.Queue(config.get('LOG_QUEUE_SIZE', 10000)))
+        self.handler.addFilter(DebugSampler(config.get('LOG_DEBUG_SAMPLE_RATE', 0.01)))
+        self.listener = logging.handlers.QueueListener(self.handler.queue, output, respect_handler_level=True)
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(self.handler)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def _configure_levels(self, config):
+        logging.getLogger().setLevel(config.get('LOG_LEVEL', 'INFO'))
+        # "sqlalchemy.engine=WARNING,routes=DEBUG"
+        for item in (config.get('LOG_LEVELS') or '').split(','):
+            if '=' in item:
+                name, level = item.split('=', 1)
+                logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+    def stop(self):
+        # Flushes whatever is still queued; safe to call more than once
+        with self._lock:
+            if self.listener is not None and self.listener._thread is not None:
+                self.listener.stop()
+
+    def restart(self):
+        # After fork() the writer thread does not exist in the child and the inherited queue's
+        # locks may be held; give the child its own queue and writer
+        if self.listener is None:
+            return
+        self._lock = threading.Lock()
+        self.handler.queue = queue.Queue(self.handler.queue.maxsize)
+        self.listener = logging.handlers.QueueListener(self.handler.queue, *self.listener.handlers,
+                                                       respect_handler_level=True)
+        self.listener.start()
+
+    def stats(self):
+        return {
+            'queue_depth': self.handler.queue.qsize() if self.handler else 0,
+            'dropped': self.handler.dropped if self.handler else 0,
+        }
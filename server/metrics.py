@@ -0,0 +1,251 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import ExitStack
+from flask import current_app, g, request
+from sql_tracking import time_queries
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        # Prometheus buckets are cumulative and end with +Inf
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            yield bound, running
+
+class EndpointStats:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.sql_statements = Histogram(SQL_COUNT_BUCKETS)
+        self.sql_seconds = 0.0
+        self.statuses = {}
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class RequestMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._slowest = []
+        self._tiebreak = itertools.count()
+        self.started_at = time.time()
+        self.slow_threshold = 1.0
+        self.slow_log_size = 20
+        self.collectors = {}
+
+    def init_app(self, app):
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+        self.slow_threshold = app.config.get('SLOW_REQUEST_THRESHOLD', 1.0)
+        self.slow_log_size = app.config.get('SLOW_REQUEST_LOG_SIZE', 20)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+        app.extensions['request_metrics'] = self
+
+    def add_collector(self, key, collector):
+        # collector() returns (name, type, help, [(labels dict, value), ...]) tuples
+        self.collectors[key] = collector
+
+    def _start(self):
+        stack = ExitStack()
+        g._metrics_stack = stack
+        g._metrics_started = time.perf_counter()
+        g._metrics_queries = stack.enter_context(time_queries(keep_statements=self.slow_threshold > 0))
+
+    def _finish(self, response):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        queries = g._metrics_queries
+        # Streamed responses have no known length; they are counted as zero bytes
+        size = response.content_length or 0
+        self.observe(request.endpoint or 'unmatched', request.method, response.status_code,
+                     elapsed, size, queries)
+        if self.slow_threshold > 0 and elapsed >= self.slow_threshold:
+            self._record_slow(elapsed, response.status_code, queries)
+        return response
+
+    def _teardown(self, exc):
+        stack = g.pop('_metrics_stack', None)
+        if stack is not None:
+            stack.close()
+
+    def observe(self, endpoint, method, status, seconds, size, queries):
+        with self._lock:
+            stats = self._endpoints.get((endpoint, method))
+            if stats is None:
+                stats = self._endpoints[(endpoint, method)] = EndpointStats()
+            stats.latency.observe(seconds)
+            stats.response_size.observe(size)
+            stats.sql_statements.observe(queries.count)
+            stats.sql_seconds += queries.seconds
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def _record_slow(self, elapsed, status, queries):
+        entry = {
+            'endpoint': request.endpoint or 'unmatched',
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'status': status,
+            'seconds': round(elapsed, 6),
+            'at': time.time(),
+            'sql_seconds': round(queries.seconds, 6),
+            'sql': [{'statement': ' '.join(statement.split()), 'seconds': round(seconds, 6)}
+                    for statement, seconds in queries.statements],
+        }
+        current_app.logger.warning("Slow request %s %s took %.3fs (%d SQL statements, %.3fs in SQL)",
+                                   entry['method'], entry['path'], elapsed, queries.count, queries.seconds)
+        with self._lock:
+            # Min-heap keyed on duration keeps only the slowest N
+            item = (elapsed, next(self._tiebreak), entry)
+            if len(self._slowest) < self.slow_log_size:
+                heapq.heappush(self._slowest, item)
+            elif elapsed > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def slow_requests(self):
+        with self._lock:
+            return [entry for _, _, entry in sorted(self._slowest, key=lambda item: -item[0])]
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._slowest.clear()
+
+    def render_prometheus(self):
+        with self._lock:
+            snapshot = sorted(self._endpoints.items())
+            lines = []
+
+            def family(name, kind, help_text):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+            def histogram(name, help_text, attribute):
+                family(name, 'histogram', help_text)
+                for (endpoint, method), stats in snapshot:
+                    hist = getattr(stats, attribute)
+                    for bound, count in hist.cumulative():
+                        lines.append(f"{name}_bucket{_labels(endpoint=endpoint, method=method, le=_number(bound))} {count}")
+                    lines.append(f"{name}_sum{_labels(endpoint=endpoint, method=method)} {_number(hist.sum)}")
+                    lines.append(f"{name}_count{_labels(endpoint=endpoint, method=method)} {hist.count}")
+
+            family('shopease_http_requests_total', 'counter', 'HTTP requests by endpoint and status code.')
+            for (endpoint, method), stats in snapshot:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f"shopease_http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}")
+            histogram('shopease_http_request_duration_seconds', 'Request latency.', 'latency')
+            histogram('shopease_http_response_size_bytes', 'Response body size.', 'response_size')
+            histogram('shopease_sql_statements_per_request', 'SQL statements issued per request.', 'sql_statements')
+            family('shopease_sql_duration_seconds_total', 'counter', 'Time spent executing SQL.')
+            for (endpoint, method), stats in snapshot:
+                lines.append(f"shopease_sql_duration_seconds_total{_labels(endpoint=endpoint, method=method)} {_number(stats.sql_seconds)}")
+
+        family('shopease_process_start_time_seconds', 'gauge', 'Unix time the metrics collector started.')
+        lines.append(f"shopease_process_start_time_seconds {_number(self.started_at)}")
+        for collector in self.collectors.values():
+            for name, kind, help_text, samples in collector():
+                family(name, kind, help_text)
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(**labels) if labels else ''} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+def password_hasher_collector(hasher):
+    def collect():
+        stats = hasher.stats()
+        return [
+            ('shopease_password_hash_queue_depth', 'gauge', 'Password hashes queued or running.',
+             [({}, stats['queue_depth'])]),
+            ('shopease_password_hash_completed_total', 'counter', 'Password hashes completed.',
+             [({}, stats['completed'])]),
+            ('shopease_password_hash_rejected_total', 'counter', 'Password hashes rejected as busy.',
+             [({}, stats['rejected'])]),
+            ('shopease_password_hash_seconds_total', 'counter', 'Time spent hashing passwords.',
+             [({}, stats['latency_seconds_sum'])]),
+        ]
+    return collect
+
+def catalog_cache_collector(cache):
+    def collect():
+        return [
+            ('shopease_catalog_cache_entries', 'gauge', 'Cached catalog responses.',
+             [({}, len(cache.entries))]),
+            ('shopease_catalog_cache_version', 'gauge', 'Catalog cache generation.',
+             [({}, cache.version)]),
+            ('shopease_catalog_cache_bytes', 'gauge', 'Bytes held by cached catalog responses.',
+             [({}, cache.entries.bytes)]),
+            ('shopease_catalog_cache_skipped_total', 'counter', 'Responses too large to cache.',
+             [({}, cache.skipped)]),
+        ]
+    return collect
+
+def log_pipeline_collector(pipeline):
+    def collect():
+        stats = pipeline.stats()
+        return [
+            ('shopease_log_queue_depth', 'gauge', 'Log records waiting for the writer thread.',
+             [({}, stats['queue_depth'])]),
+            ('shopease_log_dropped_total', 'counter', 'Log records dropped because the queue was full.',
+             [({}, stats['dropped'])]),
+        ]
+    return collect
+
+def compression_collector(compressor):
+    def collect():
+        stats = compressor.stats()
+        return [
+            ('shopease_compressed_responses_total', 'counter', 'Response bodies compressed.',
+             [({}, stats['compressed'])]),
+            ('shopease_compressed_reused_total', 'counter', 'Responses served from cached compressed bytes.',
+             [({}, stats['reused'])]),
+            ('shopease_compression_input_bytes_total', 'counter', 'Uncompressed bytes of compressed responses.',
+             [({}, stats['bytes_in'])]),
+            ('shopease_compression_output_bytes_total', 'counter', 'Compressed bytes sent.',
+             [({}, stats['bytes_out'])]),
+        ]
+    return collect
+
+def rate_limiter_collector(limiter):
+    def collect():
+        stats = limiter.stats()
+        return [
+            ('shopease_rate_limit_buckets', 'gauge', 'Token buckets currently tracked.',
+             [({}, stats['buckets'])]),
+            ('shopease_rate_limited_total', 'counter', 'Requests refused with 429.',
+             [({'endpoint': endpoint, 'scope': scope}, count)
+              for (endpoint, scope), count in sorted(stats['rejected'].items())]),
+        ]
+    return collect
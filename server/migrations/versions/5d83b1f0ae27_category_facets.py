@@ -0,0 +1,85 @@
+"""category facet summary table
+
+Revision ID: 5d83b1f0ae27
+Revises: c47a2e9f5d13
+Create Date: 2026-10-18 16:41:09.602318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d83b1f0ae27'
+down_revision = 'c47a2e9f5d13'
+branch_labels = None
+depends_on = None
+
+
+FACET_TRIGGERS_DDL = (
+    """CREATE TRIGGER IF NOT EXISTS category_facet_ai AFTER INSERT ON product BEGIN
+        INSERT INTO category_facet(category, product_count, in_stock_count, min_price, max_price)
+        SELECT new.category, 1, new.stock > 0, new.price, new.price WHERE new.category IS NOT NULL
+        ON CONFLICT(category) DO UPDATE SET
+            product_count = product_count + 1,
+            in_stock_count = in_stock_count + excluded.in_stock_count,
+            min_price = min(min_price, excluded.min_price),
+            max_price = max(max_price, excluded.max_price);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS category_facet_ad AFTER DELETE ON product BEGIN
+        UPDATE category_facet SET
+            product_count = product_count - 1,
+            in_stock_count = in_stock_count - (old.stock > 0),
+            min_price = CASE WHEN old.price <= min_price
+                THEN (SELECT MIN(price) FROM product WHERE category = old.category) ELSE min_price END,
+            max_price = CASE WHEN old.price >= max_price
+                THEN (SELECT MAX(price) FROM product WHERE category = old.category) ELSE max_price END
+        WHERE category = old.category;
+        DELETE FROM category_facet WHERE category = old.category AND product_count <= 0;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS category_facet_au AFTER UPDATE OF category, price, stock ON product BEGIN
+        UPDATE category_facet SET
+            product_count = product_count - 1,
+            in_stock_count = in_stock_count - (old.stock > 0),
+            min_price = CASE WHEN old.price <= min_price
+                THEN (SELECT MIN(price) FROM product WHERE category = old.category) ELSE min_price END,
+            max_price = CASE WHEN old.price >= max_price
+                THEN (SELECT MAX(price) FROM product WHERE category = old.category) ELSE max_price END
+        WHERE category = old.category;
+        DELETE FROM category_facet WHERE category = old.category AND product_count <= 0;
+        INSERT INTO category_facet(category, product_count, in_stock_count, min_price, max_price)
+        SELECT new.category, 1, new.stock > 0, new.price, new.price WHERE new.category IS NOT NULL
+        ON CONFLICT(category) DO UPDATE SET
+            product_count = product_count + 1,
+            in_stock_count = in_stock_count + excluded.in_stock_count,
+            min_price = min(min_price, excluded.min_price),
+            max_price = max(max_price, excluded.max_price);
+    END""",
+)
+
+
+def upgrade():
+    op.create_table('category_facet',
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('product_count', sa.Integer(), nullable=False),
+    sa.Column('in_stock_count', sa.Integer(), nullable=False),
+    sa.Column('min_price', sa.Float(), nullable=True),
+    sa.Column('max_price', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('category')
+    )
+    op.execute("""
+        INSERT INTO category_facet(category, product_count, in_stock_count, min_price, max_price)
+        SELECT category, COUNT(id), SUM(CASE WHEN stock > 0 THEN 1 ELSE 0 END), MIN(price), MAX(price)
+        FROM product WHERE category IS NOT NULL GROUP BY category
+    """)
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for statement in FACET_TRIGGERS_DDL:
+        op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('category_facet_ai', 'category_facet_ad', 'category_facet_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.drop_table('category_facet')
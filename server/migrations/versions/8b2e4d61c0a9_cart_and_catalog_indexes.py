@@ -0,0 +1,56 @@
+"""cart, wishlist and catalog indexes
+
+Revision ID: 8b2e4d61c0a9
+Revises: 3f1c9a7d2b64
+Create Date: 2026-10-18 10:24:03.551870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d61c0a9'
+down_revision = '3f1c9a7d2b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Merge duplicate cart rows left behind before (user_id, product_id) was unique
+    op.execute("""
+        UPDATE cart_item SET quantity = (
+            SELECT SUM(c2.quantity) FROM cart_item AS c2
+            WHERE c2.user_id = cart_item.user_id AND c2.product_id = cart_item.product_id)
+        WHERE id IN (SELECT MIN(id) FROM cart_item GROUP BY user_id, product_id HAVING COUNT(*) > 1)
+    """)
+    op.execute("""
+        DELETE FROM cart_item
+        WHERE id NOT IN (SELECT MIN(id) FROM cart_item GROUP BY user_id, product_id)
+    """)
+
+    with op.batch_alter_table('cart_item', schema=None) as batch_op:
+        batch_op.create_unique_constraint('_cart_user_product_uc', ['user_id', 'product_id'])
+        batch_op.create_index('ix_cart_item_product_id', ['product_id'], unique=False)
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_category_date_added', ['category', 'date_added', 'id'], unique=False)
+        batch_op.create_index('ix_product_date_added', ['date_added', 'id'], unique=False)
+        batch_op.create_index('ix_product_image_url', ['image_url'], unique=False)
+
+    with op.batch_alter_table('wishlist_item', schema=None) as batch_op:
+        batch_op.create_index('ix_wishlist_item_product_id', ['product_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('wishlist_item', schema=None) as batch_op:
+        batch_op.drop_index('ix_wishlist_item_product_id')
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_image_url')
+        batch_op.drop_index('ix_product_date_added')
+        batch_op.drop_index('ix_product_category_date_added')
+
+    with op.batch_alter_table('cart_item', schema=None) as batch_op:
+        batch_op.drop_index('ix_cart_item_product_id')
+        batch_op.drop_constraint('_cart_user_product_uc', type_='unique')
@@ -0,0 +1,40 @@
+"""cascade product deletes to cart and wishlist rows
+
+Revision ID: a91c4e7b3f20
+Revises: 5d83b1f0ae27
+Create Date: 2026-10-18 19:02:47.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a91c4e7b3f20'
+down_revision = '5d83b1f0ae27'
+branch_labels = None
+depends_on = None
+
+# The initial schema left these foreign keys unnamed; the convention names them on reflection
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+TABLES = ('cart_item', 'wishlist_item')
+
+
+def upgrade():
+    for table in TABLES:
+        # Foreign keys were never enforced on SQLite, so rows may point at deleted products
+        # or users; they would fail the copy into the rebuilt table
+        op.execute(f"DELETE FROM {table} WHERE product_id NOT IN (SELECT id FROM product)")
+        op.execute(f'DELETE FROM {table} WHERE user_id NOT IN (SELECT id FROM "user")')
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(f'fk_{table}_product_id_product', type_='foreignkey')
+            batch_op.create_foreign_key(f'fk_{table}_product_id_product', 'product',
+                                        ['product_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(f'fk_{table}_product_id_product', type_='foreignkey')
+            batch_op.create_foreign_key(f'fk_{table}_product_id_product', 'product',
+                                        ['product_id'], ['id'])
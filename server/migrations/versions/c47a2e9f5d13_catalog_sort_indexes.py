@@ -0,0 +1,30 @@
+"""catalog sort indexes
+
+Revision ID: c47a2e9f5d13
+Revises: 8b2e4d61c0a9
+Create Date: 2026-10-18 14:02:37.118406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47a2e9f5d13'
+down_revision = '8b2e4d61c0a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_category_price', ['category', 'price', 'id'], unique=False)
+        batch_op.create_index('ix_product_price', ['price', 'id'], unique=False)
+        batch_op.create_index('ix_product_name', ['name', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_name')
+        batch_op.drop_index('ix_product_price')
+        batch_op.drop_index('ix_product_category_price')
@@ -1,6 +1,7 @@
 from extensions import db
 from datetime import datetime
 from sqlalchemy.orm import relationship
+from images import expand_image_urls, upload_url_prefix
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -24,19 +25,55 @@ class Product(db.Model):
     date_added = db.Column(db.DateTime, default=datetime.utcnow)
     category = db.Column(db.String(50), nullable=True)
 
-    cart_items = relationship('CartItem', back_populates='product', cascade='all, delete')
-    wishlist_items = relationship('WishlistItem', back_populates='product', cascade='all, delete')
+    # ON DELETE CASCADE removes cart and wishlist rows; passive_deletes stops the ORM from
+    # loading those collections just to delete them
+    cart_items = relationship('CartItem', back_populates='product', cascade='all, delete', passive_deletes=True)
+    wishlist_items = relationship('WishlistItem', back_populates='product', cascade='all, delete',
+                                  passive_deletes=True)
 
-    def to_dict(self):
-        return {
+    __table_args__ = (
+        # Category browse and the default newest-first listing are both keyset scans
+        db.Index('ix_product_category_date_added', 'category', 'date_added', 'id'),
+        db.Index('ix_product_date_added', 'date_added', 'id'),
+        # Price and name sorts, with and without a category filter
+        db.Index('ix_product_category_price', 'category', 'price', 'id'),
+        db.Index('ix_product_price', 'price', 'id'),
+        db.Index('ix_product_name', 'name', 'id'),
+        # Upload reference counting looks products up by stored filename
+        db.Index('ix_product_image_url', 'image_url'),
+    )
+
+    def to_dict(self, url_prefix=None):
+        # Image fields are URLs; pass url_prefix when serializing many products at once
+        return expand_image_urls({
             'id': self.id,
             'name': self.name,
             'description': self.description,
             'price': self.price,
             'stock': self.stock,
             'image_url': self.image_url,
+            'image_variants': None,
             'date_added': self.date_added.isoformat(),
             'category': self.category
+        }, upload_url_prefix() if url_prefix is None else url_prefix)
+
+class CategoryFacet(db.Model):
+    # Per-category summary of product, maintained by triggers (see facets.py)
+    __tablename__ = 'category_facet'
+
+    category = db.Column(db.String(50), primary_key=True)
+    product_count = db.Column(db.Integer, nullable=False, default=0)
+    in_stock_count = db.Column(db.Integer, nullable=False, default=0)
+    min_price = db.Column(db.Float, nullable=True)
+    max_price = db.Column(db.Float, nullable=True)
+
+    def to_dict(self):
+        return {
+            'category': self.category,
+            'product_count': self.product_count,
+            'in_stock_count': self.in_stock_count,
+            'min_price': self.min_price,
+            'max_price': self.max_price
         }
 
 class CartItem(db.Model):
@@ -44,35 +81,44 @@ class CartItem(db.Model):
     quantity = db.Column(db.Integer, nullable=False, default=1)
 
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False)
 
     user = relationship('User', back_populates='cart_items')
     product = relationship('Product', back_populates='cart_items')
 
-    def to_dict(self):
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'product_id', name='_cart_user_product_uc'),
+        db.Index('ix_cart_item_product_id', 'product_id'),
+    )
+
+    def to_dict(self, url_prefix=None):
         return {
             'id': self.id,
             'quantity': self.quantity,
             'user_id': self.user_id,
             'product_id': self.product_id,
-            'product': self.product.to_dict()
+            'product': self.product.to_dict(url_prefix)
         }
 
 class WishlistItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
 
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False)
 
     user = relationship('User', back_populates='wishlist_items')
     product = relationship('Product', back_populates='wishlist_items')
 
-    __table_args__ = (db.UniqueConstraint('user_id', 'product_id', name='_user_product_uc'),)
+    # user_id leads the unique index, so per-user scans are served by it (and covered for product_id)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'product_id', name='_user_product_uc'),
+        db.Index('ix_wishlist_item_product_id', 'product_id'),
+    )
 
-    def to_dict(self):
+    def to_dict(self, url_prefix=None):
         return {
             'id': self.id,
             'user_id': self.user_id,
             'product_id': self.product_id,
-            'product': self.product.to_dict()
+            'product': self.product.to_dict(url_prefix)
         }
\ No newline at end of file
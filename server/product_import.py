@@ -0,0 +1,197 @@
+import csv
+import io
+import json
+import zipfile
+import zlib
+from sqlalchemy import insert
+from extensions import db, image_processor
+from models import Product
+from uploads import store_upload, release_upload
+from validators import allowed_file, validate_product_fields, ProductValidationError
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+def detect_format(explicit_format, content_type, filename=None):
+    if explicit_format:
+        if explicit_format not in IMPORT_FORMATS:
+            raise ValueError(f"Unsupported import format '{explicit_format}'. Use csv or ndjson.")
+        return explicit_format
+    content_type = (content_type or '').lower()
+    filename = (filename or '').lower()
+    if 'csv' in content_type or filename.endswith('.csv'):
+        return 'csv'
+    if 'ndjson' in content_type or 'jsonl' in content_type or filename.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    raise ValueError("Could not detect import format. Send text/csv or application/x-ndjson, or pass ?format=")
+
+class LineDecoder:
+    # Decodes the upload one line at a time, so a bad byte fails the row it is in instead of
+    # aborting an import whose earlier batches are already committed
+    def __init__(self, binary_stream):
+        if not isinstance(binary_stream, io.BufferedIOBase):
+            binary_stream = io.BufferedReader(binary_stream)
+        self._lines = iter(binary_stream)
+        self._first = True
+        self.error = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self._lines)
+        if self._first:
+            self._first = False
+            if line.startswith(b'\xef\xbb\xbf'):
+                line = line[3:]
+        try:
+            return line.decode('utf-8')
+        except UnicodeDecodeError as e:
+            self.error = f"Invalid UTF-8 at byte {e.start} of the line"
+            return line.decode('utf-8', errors='replace')
+
+    def take_error(self):
+        error, self.error = self.error, None
+        return error
+
+def open_lines(binary_stream):
+    return LineDecoder(binary_stream)
+
+def iter_rows(lines, import_format):
+    # Yields (row_number, row_dict_or_None, parse_error) one line at a time
+    if import_format == 'csv':
+        reader = csv.DictReader(lines)
+        try:
+            reader.fieldnames
+        except csv.Error as e:
+            raise ValueError(f"Malformed CSV header: {e}")
+        if lines.take_error():
+            raise ValueError("CSV header is not valid UTF-8")
+        row_number = 0
+        while True:
+            row_number += 1
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                lines.take_error()
+                yield row_number, None, f"Malformed CSV: {e}"
+                continue
+            error = lines.take_error()
+            yield row_number, None if error else row, error
+
+    row_number = 0
+    for line in lines:
+        error = lines.take_error()
+        if not line.strip():
+            continue
+        row_number += 1
+        if error:
+            yield row_number, None, error
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield row_number, None, "Each line must be a JSON object"
+            continue
+        yield row_number, row, None
+
+def _text(value):
+    # NDJSON may carry numbers; validate them exactly like the form strings create_product gets
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+class ImportReport:
+    def __init__(self, max_errors):
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def add_error(self, row_number, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row_number, "error": message})
+
+    def to_dict(self):
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors)
+        }
+
+class ProductImporter:
+    def __init__(self, upload_folder, batch_size=1000, max_errors=1000, images_zip=None):
+        self.upload_folder = upload_folder
+        self.batch_size = batch_size
+        self.images = zipfile.ZipFile(images_zip) if images_zip is not None else None
+        self.report = ImportReport(max_errors)
+        self._batch = []
+
+    def _store_image(self, image_name):
+        if self.images is None:
+            raise ProductValidationError("Row references an image but no images archive was uploaded")
+        if not allowed_file(image_name):
+            raise ProductValidationError("Invalid image file type. Allowed: png, jpg, jpeg, webp")
+        try:
+            with self.images.open(image_name) as member:
+                extension = image_name.rsplit('.', 1)[1].lower()
+                filename, created = store_upload(member, self.upload_folder, extension)
+        except KeyError:
+            raise ProductValidationError(f"Image '{image_name}' not found in images archive")
+        except (zipfile.BadZipFile, zlib.error) as e:
+            raise ProductValidationError(f"Image '{image_name}' could not be read from the archive: {e}")
+        if created:
+            image_processor.submit(filename, self.upload_folder)
+        return filename
+
+    def _flush(self):
+        if not self._batch:
+            return
+        row_numbers = [row_number for row_number, _ in self._batch]
+        values = [value for _, value in self._batch]
+        self._batch = []
+        try:
+            # One multi-row INSERT and one commit per batch
+            db.session.execute(insert(Product), values)
+            db.session.commit()
+            self.report.inserted += len(values)
+        except Exception as e:
+            db.session.rollback()
+            for row_number in row_numbers:
+                self.report.add_error(row_number, f"Database error: {e}")
+            for value in values:
+                release_upload(value.get('image_url'), self.upload_folder)
+
+    def add_row(self, row_number, row):
+        try:
+            product_fields = validate_product_fields(
+                _text(row.get('name')), _text(row.get('description')),
+                _text(row.get('price')), _text(row.get('stock')), _text(row.get('category')))
+            image_name = _text(row.get('image'))
+            product_fields['image_url'] = self._store_image(image_name) if image_name else None
+        except ProductValidationError as e:
+            self.report.add_error(row_number, str(e))
+            return
+
+        self._batch.append((row_number, product_fields))
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+
+    def run(self, rows):
+        # Rows validated before an error that stops the import are still committed, so the
+        # report always describes what is in the catalog
+        try:
+            for row_number, row, parse_error in rows:
+                if parse_error:
+                    self.report.add_error(row_number, parse_error)
+                else:
+                    self.add_row(row_number, row)
+        finally:
+            self._flush()
+        return self.report
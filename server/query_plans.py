@@ -0,0 +1,177 @@
+"""Query-plan regression check for the hot API routes.
+
+Seeds a temporary SQLite database, drives each route through the Flask test
+client, runs EXPLAIN QUERY PLAN on every statement the route issued, and exits
+non-zero if any of them falls back to a full table scan (or an unexpected
+temporary sort). tests/test_query_plans.py runs the same checks on a small
+catalog; this script is for checking the plans at production scale.
+
+    python query_plans.py --products 100000 --users 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+from flask_jwt_extended import create_access_token
+from sqlalchemy import select
+from config import Config
+from sql_tracking import record_queries
+
+# (label, method, path, json body, temp B-tree sorts allowed)
+HOT_ROUTES = (
+    ('catalog first page', 'GET', '/api/products?limit=24', None, False),
+    ('catalog next page', 'GET', '/api/products?limit=24&after={cursor}', None, False),
+    ('category first page', 'GET', '/api/products?limit=24&category=Clothes', None, False),
+    ('category next page', 'GET', '/api/products?limit=24&category=Clothes&after={category_cursor}', None, False),
+    ('price sort', 'GET', '/api/products?limit=24&sort=price_asc&price_min=10&price_max=500', None, False),
+    ('price sort next page', 'GET', '/api/products?limit=24&sort=price_desc&after={price_cursor}', None, False),
+    ('category price sort', 'GET', '/api/products?limit=24&category=Clothes&sort=price_asc&in_stock=1', None, False),
+    ('name sort', 'GET', '/api/products?limit=24&sort=name', None, False),
+    # A price range under the newest-first sort can narrow on the price index and sort the remainder
+    ('filtered catalog total', 'GET', '/api/products?limit=24&category=Clothes&price_max=50', None, True),
+    ('category facets', 'GET', '/api/products/facets', None, False),
+    ('product detail', 'GET', '/api/products/{product_id}', None, False),
+    # bm25 ordering has to rank every match, so the sort is expected there
+    ('search', 'GET', '/api/products/search?q=walnut%20desk', None, True),
+    ('login', 'POST', '/api/login/user', {'email': '{email}', 'password': '{password}'}, False),
+    ('cart', 'GET', '/api/cart', None, False),
+    ('wishlist', 'GET', '/api/wishlist', None, False),
+    ('add to cart', 'POST', '/api/cart', {'product_id': '{product_id}', 'quantity': 1}, False),
+    ('update cart item', 'PUT', '/api/cart/{cart_item_id}', {'quantity': 1}, False),
+    ('batch cart update', 'PATCH', '/api/cart',
+     {'operations': [{'op': 'add', 'product_id': '{product_id}', 'quantity': 1},
+                     {'op': 'set', 'product_id': '{product_id}', 'quantity': 1}]}, False),
+    ('add to wishlist', 'POST', '/api/wishlist', {'product_id': '{product_id}'}, False),
+    ('remove from wishlist', 'DELETE', '/api/wishlist/{product_id}', None, False),
+    ('remove from cart', 'DELETE', '/api/cart/{cart_item_id}', None, False),
+    ('admin delete product', 'DELETE', '/api/admin/products/{delete_product_id}', None, False),
+)
+
+def _fill(template, values):
+    if isinstance(template, str):
+        if template.startswith('{') and template.endswith('}') and template[1:-1] in values:
+            return values[template[1:-1]]
+        return template.format(**values)
+    if isinstance(template, dict):
+        return {k: _fill(v, values) for k, v in template.items()}
+    if isinstance(template, list):
+        return [_fill(v, values) for v in template]
+    return template
+
+def plan_problems(connection, query, allow_sort):
+    if query.executemany:
+        return [], []
+    statement = query.statement.lstrip()
+    if not statement.upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'WITH')):
+        return [], []
+    details = [row[-1] for row in
+               connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", query.parameters)]
+    problems = []
+    for detail in details:
+        if detail.startswith('SCAN ') and ' USING ' not in detail and 'VIRTUAL TABLE' not in detail \
+                and detail != 'SCAN CONSTANT ROW':
+            problems.append(detail)
+        elif detail.startswith('USE TEMP B-TREE') and not allow_sort:
+            problems.append(detail)
+    return details, problems
+
+def prepare_routes(app, client, products):
+    # Placeholder values for HOT_ROUTES, plus (user, admin) headers; needs a seeded database
+    from extensions import db
+    from models import CartItem, Product, User
+    from seed import ADMIN_EMAIL, SEED_PASSWORD
+
+    cart_item = db.session.execute(select(CartItem.id, CartItem.user_id).limit(1)).first()
+    admin_id = db.session.execute(select(User.id).where(User.email == ADMIN_EMAIL)).scalar()
+    values = {
+        'email': 'user0@example.com',
+        'password': SEED_PASSWORD,
+        'product_id': db.session.execute(select(Product.id).where(Product.stock >= 25).limit(1)).scalar(),
+        'delete_product_id': products // 2,
+        'cart_item_id': cart_item.id,
+    }
+    values['cursor'] = client.get('/api/products?limit=24').json['next_cursor']
+    values['category_cursor'] = client.get('/api/products?limit=24&category=Clothes').json['next_cursor']
+    values['price_cursor'] = client.get('/api/products?limit=24&sort=price_desc').json['next_cursor']
+    user_headers = {'Authorization': 'Bearer ' + create_access_token(
+        identity=str(cart_item.user_id), additional_claims={'is_admin': False})}
+    admin_headers = {'Authorization': 'Bearer ' + create_access_token(
+        identity=str(admin_id), additional_claims={'is_admin': True})}
+    return values, user_headers, admin_headers
+
+def check_route(client, route, values, user_headers, admin_headers):
+    # Drives one HOT_ROUTES entry; returns (response, [(statement, plan details, problems)])
+    from extensions import db
+
+    label, method, path, body, allow_sort = route
+    headers = admin_headers if '/admin/' in path else user_headers
+    with record_queries() as queries:
+        response = client.open(_fill(path, values), method=method, json=_fill(body, values), headers=headers)
+    if response.status_code >= 400:
+        return response, []
+    with db.engine.connect() as connection:
+        return response, [(query.statement,) + plan_problems(connection, query, allow_sort) for query in queries]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--analyze', action='store_true', help='run ANALYZE after seeding')
+    parser.add_argument('--verbose', action='store_true', help='print every plan')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='query-plans-')
+
+    class PlanCheckConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'plans.db')
+        SQLALCHEMY_READ_DATABASE_URI = None
+        UPLOAD_FOLDER = os.path.join(workdir, 'uploads')
+        PASSWORD_HASH_WORKERS = 0
+        BCRYPT_LOG_ROUNDS = 4
+        IMAGE_WORKERS = 0
+
+    from app import create_app
+    from extensions import db
+    from seed import seed_database
+
+    os.makedirs(PlanCheckConfig.UPLOAD_FOLDER, exist_ok=True)
+    app = create_app(PlanCheckConfig)
+    failures = 0
+    with app.app_context():
+        db.create_all()
+        counts = seed_database(products=args.products, users=args.users,
+                               rounds=PlanCheckConfig.BCRYPT_LOG_ROUNDS)
+        if args.analyze:
+            db.session.execute(db.text('ANALYZE'))
+            db.session.commit()
+        print(f"Seeded {counts}")
+
+        client = app.test_client()
+        values, user_headers, admin_headers = prepare_routes(app, client, args.products)
+
+        # Fresh cache so every catalog route actually reaches the database
+        from extensions import catalog_cache
+        catalog_cache.bump_version()
+
+        for route in HOT_ROUTES:
+            label = route[0]
+            response, route_problems = check_route(client, route, values, user_headers, admin_headers)
+            if response.status_code >= 400:
+                print(f"FAIL  {label}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+                failures += 1
+                continue
+
+            bad = [entry for entry in route_problems if entry[2]]
+            print(f"{'FAIL' if bad else 'ok  '}  {label} ({len(route_problems)} statements)")
+            for statement, details, problems in (route_problems if args.verbose else bad):
+                print("        " + " ".join(statement.split())[:160])
+                for detail in (details if args.verbose else problems):
+                    print(f"          -> {detail}")
+            failures += bool(bad)
+
+    print(f"{failures} route(s) with plan regressions" if failures else "All hot queries use indexes.")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import math
+import threading
+import time
+from collections import namedtuple
+from flask import jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from sqlite_store import SQLiteConnections, sqlite_path
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+WRITE_METHODS = frozenset({'POST', 'PUT', 'PATCH', 'DELETE'})
+
+# rate is tokens per second; burst is the bucket size
+Rule = namedtuple('Rule', ['scope', 'rate', 'burst'])
+
+def parse_rules(spec):
+    # "ip:20/minute email:5/minute" -> [Rule('ip', 0.333, 20), Rule('email', 0.083, 5)]
+    rules = []
+    for item in (spec or '').split():
+        scope, _, limit = item.partition(':')
+        count, _, period = limit.partition('/')
+        if scope not in ('ip', 'email', 'account') or period not in PERIODS or not count.isdigit() or int(count) < 1:
+            raise ValueError(f"Invalid rate limit rule '{item}'; expected e.g. ip:20/minute or account:5/hour")
+        rules.append(Rule(scope, int(count) / PERIODS[period], int(count)))
+    return rules
+
+class MemoryBucketStore:
+    # Buckets are spread over independently locked shards so concurrent requests for
+    # different clients rarely wait on each other
+    def __init__(self, shards=16, sweep_every=1024):
+        self.shards = [({}, threading.Lock()) for _ in range(shards)]
+        self.sweep_every = sweep_every
+        self._ops = [0] * shards
+
+    def take(self, key, rate, burst, now=None):
+        # Returns 0 when a token was taken, otherwise the seconds until one is available
+        now = time.monotonic() if now is None else now
+        index = hash(key) % len(self.shards)
+        buckets, lock = self.shards[index]
+        with lock:
+            bucket = buckets.get(key)
+            tokens = burst if bucket is None else min(burst, bucket[0] + (now - bucket[1]) * rate)
+            self._ops[index] += 1
+            if self._ops[index] >= self.sweep_every:
+                self._ops[index] = 0
+                self._sweep(buckets, now)
+            if tokens < 1:
+                return (1 - tokens) / rate
+            tokens -= 1
+            # A bucket that has refilled is the same as no bucket; full_at lets the sweep drop it
+            buckets[key] = [tokens, now, now + (burst - tokens) / rate]
+            return 0
+
+    def _sweep(self, buckets, now):
+        for key in [key for key, bucket in buckets.items() if bucket[2] <= now]:
+            del buckets[key]
+
+    def __len__(self):
+        return sum(len(buckets) for buckets, _ in self.shards)
+
+class SQLiteBucketStore:
+    # Shared between worker processes through one small SQLite file; each take is one
+    # atomic UPSERT, and a second query only when the request is refused
+    SCHEMA = """CREATE TABLE IF NOT EXISTS rate_limit_bucket (
+        key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)"""
+    TAKE = """
+        INSERT INTO rate_limit_bucket(key, tokens, updated, full_at)
+        VALUES (:key, :burst - 1, :now, :now + 1 / :rate)
+        ON CONFLICT(key) DO UPDATE SET
+            tokens = min(:burst, tokens + (:now - updated) * :rate) - 1,
+            updated = :now,
+            full_at = :now + (:burst - (min(:burst, tokens + (:now - updated) * :rate) - 1)) / :rate
+        WHERE min(:burst, tokens + (:now - updated) * :rate) >= 1
+        RETURNING tokens"""
+
+    def __init__(self, path, sweep_every=1024):
+        self.connections = SQLiteConnections(path, synchronous='OFF')
+        self.sweep_every = sweep_every
+        self._ops = 0
+        self._connection().execute(self.SCHEMA)
+
+    def _connection(self):
+        return self.connections.get()
+
+    def take(self, key, rate, burst, now=None):
+        # Wall-clock time, since monotonic clocks are not comparable across processes
+        now = time.time() if now is None else now
+        connection = self._connection()
+        params = {'key': key, 'rate': rate, 'burst': burst, 'now': now}
+        if connection.execute(self.TAKE, params).fetchone() is not None:
+            self._ops += 1
+            if self._ops >= self.sweep_every:
+                self._ops = 0
+                connection.execute("DELETE FROM rate_limit_bucket WHERE full_at <= ?", (now,))
+            return 0
+        row = connection.execute("SELECT min(:burst, tokens + (:now - updated) * :rate) "
+                                 "FROM rate_limit_bucket WHERE key = :key", params).fetchone()
+        tokens = row[0] if row else burst
+        return max(1 - tokens, 0) / rate
+
+    def __len__(self):
+        return self._connection().execute("SELECT count(*) FROM rate_limit_bucket").fetchone()[0]
+
+def _email_identifier():
+    # The account a login or registration names in its body; read before any password hashing
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and isinstance(data.get('email'), str) and data['email'].strip():
+        return data['email'].strip().lower()
+    return None
+
+def _account_identifier():
+    # The token's user. Never taken from the body: a caller could name a fresh account in
+    # every request and never run out of tokens.
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+IDENTIFIERS = {
+    'ip': lambda: request.remote_addr,
+    'email': _email_identifier,
+    'account': _account_identifier,
+}
+
+class RateLimiter:
+    def __init__(self):
+        self.enabled = True
+        self.store = MemoryBucketStore()
+        self.endpoint_rules = {}
+        self.groups = {}
+        self.write_rules = []
+        self._lock = threading.Lock()
+        self.rejected = {}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RATE_LIMIT_ENABLED', True)
+        path = sqlite_path(app.config.get('RATE_LIMIT_STORAGE'))
+        if path:
+            self.store = SQLiteBucketStore(path)
+        self.endpoint_rules = {endpoint: parse_rules(spec)
+                               for endpoint, spec in (app.config.get('RATE_LIMITS') or {}).items()}
+        self.groups = dict(app.config.get('RATE_LIMIT_GROUPS') or {})
+        self.write_rules = parse_rules(app.config.get('RATE_LIMIT_WRITE'))
+        app.extensions['rate_limiter'] = self
+        if self.enabled:
+            app.before_request(self._check)
+
+    def rules_for(self, endpoint, method):
+        rules = self.endpoint_rules.get(endpoint)
+        if rules is None and method in WRITE_METHODS:
+            rules = self.write_rules
+        return rules or ()
+
+    def _check(self):
+        if request.method == 'OPTIONS':
+            return None
+        endpoint = request.endpoint
+        rules = self.rules_for(endpoint, request.method)
+        bucket = self.groups.get(endpoint, endpoint)
+        for rule in rules:
+            identifier = IDENTIFIERS[rule.scope]()
+            if identifier is None:
+                continue
+            retry_after = self.store.take(f"{bucket}|{rule.scope}|{identifier}", rule.rate, rule.burst)
+            if retry_after:
+                return self._reject(endpoint, rule.scope, retry_after)
+        return None
+
+    def _reject(self, endpoint, scope, retry_after):
+        with self._lock:
+            self.rejected[(endpoint, scope)] = self.rejected.get((endpoint, scope), 0) + 1
+        response = jsonify({"error": "Too many requests, please retry later",
+                            "retry_after": math.ceil(retry_after)})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(math.ceil(retry_after))
+        return response
+
+    def stats(self):
+        with self._lock:
+            rejected = dict(self.rejected)
+        return {'buckets': len(self.store), 'rejected': rejected}
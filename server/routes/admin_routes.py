@@ -1,18 +1,25 @@
-import os
+import logging
+import zipfile
 from functools import wraps
-from flask import Blueprint, request, jsonify, current_app, make_response # Added make_response
-from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request # Added verify_jwt_in_request
-from werkzeug.utils import secure_filename
-from extensions import db
+from flask import Blueprint, Response, request, jsonify, current_app, make_response, stream_with_context # Added make_response
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request # Added verify_jwt_in_request
+from sqlalchemy import and_, delete
+from werkzeug.datastructures import MultiDict
+from extensions import db, catalog_cache, image_processor, request_metrics
 from models import Product, User
+from security import admin_status_cache
+from uploads import store_upload, upload_cleaner
+from validators import allowed_file, validate_product_fields, ProductValidationError
+from product_import import ProductImporter, detect_format, iter_rows, open_lines
+from exports import EXPORT_DATASETS, EXPORT_FORMATS, stream_export
+from catalog_query import parse_catalog_filters, filter_conditions, FILTER_KEYS, TRUE_VALUES, FALSE_VALUES
 
 admin_api = Blueprint('admin_api', __name__)
+logger = logging.getLogger(__name__)
 
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
-
-def allowed_file(filename):
-    return '.' in filename and \
-        filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def load_admin_status(user_id):
+    user = db.session.get(User, user_id)
+    return bool(user and user.is_admin)
 
 # --- UPDATED ADMIN DECORATOR ---
 def admin_required(fn):
@@ -32,11 +39,15 @@ def admin_required(fn):
                 current_user_id = int(current_user_id_str)
             except (ValueError, TypeError):
                  return jsonify({"error": "Invalid user identity format in token"}), 401
-            user = User.query.get(current_user_id)
-            if not (user and user.is_admin):
+            # The signed role claim rejects non-admins without touching the database;
+            # the status cache catches demotions and deletions made after the token was issued.
+            if get_jwt().get('is_admin') is False:
+                return jsonify({"error": "Admin access required"}), 403
+            if not admin_status_cache.is_admin(current_user_id, load_admin_status):
                 return jsonify({"error": "Admin access required"}), 403
         except Exception as e:
-            print(f"DEBUG: JWT Verification Exception: {type(e).__name__} - {str(e)}")
+            # Bad or expired tokens are routine; sampled at DEBUG so they cannot flood the log
+            logger.debug("Admin JWT verification failed: %s: %s", type(e).__name__, e)
             return jsonify({"error": f"Authentication Error: {str(e)}"}), 401
         return current_app.ensure_sync(fn)(*args, **kwargs)
     return wrapper
@@ -45,38 +56,23 @@ def admin_required(fn):
 @admin_api.route('/products', methods=['POST', 'OPTIONS'])
 @admin_required
 def create_product():
-    # --- ADDED DETAILED LOGGING AT THE VERY START ---
-    print("\n--- ENTERING CREATE_PRODUCT ---")
-    print("Request Method:", request.method)
-    print("Request Headers:", request.headers)
-
     # Check if form data parsing works AT ALL
-    form_data = None # Initialize
     try:
-        # Accessing request.form triggers parsing of multipart/form-data
+        # Accessing request.form / request.files triggers multipart parsing
         form_data = request.form
-        print("Request Form Data:", form_data)
     except Exception as e:
-        print(f"!!! ERROR ACCESSING request.form: {type(e).__name__} - {e}")
+        logger.warning("Could not parse product form data: %s", e)
         return jsonify({"error": "Failed to parse form data on server."}), 400
 
-    # Check if file data parsing works
-    file_data = None # Initialize
     try:
-        # Accessing request.files triggers file part parsing
         file_data = request.files
-        print("Request Files Data:", file_data)
-        image_file = file_data.get('image') # Try getting the specific file
-        if image_file:
-            print(f"Image File Received: filename='{image_file.filename}', content_type='{image_file.content_type}'")
-        else:
-             print("!!! No 'image' file found in request.files")
-             # Server-side check for missing file
-             # return jsonify({"error": "Image file missing in request."}), 400 # Enable this if client validation isn't enough
     except Exception as e:
-        print(f"!!! ERROR ACCESSING request.files: {type(e).__name__} - {e}")
+        logger.warning("Could not parse product file data: %s", e)
         return jsonify({"error": "Failed to parse file data on server."}), 400
-    # --- END DETAILED LOGGING ---
+
+    # Field names only; the values may hold anything the admin typed
+    logger.debug("create_product request", extra={"form_fields": sorted(form_data.keys()),
+                                                  "files": sorted(file_data.keys())})
 
     # NOTE: The OPTIONS check inside the function is removed because the decorator handles it now.
 
@@ -89,59 +85,82 @@ def create_product():
         stock_str = form_data.get('stock')
         category = form_data.get('category')
 
-        print(f"Extracted Fields: Name={name}, Desc={description}, Price={price_str}, Stock={stock_str}, Cat={category}")
-
-        if not all([name, description, price_str, stock_str, category]):
-            print("!!! Validation Failed: Missing required text/selection fields.")
-            return jsonify({"error": "Missing required text or selection fields"}), 400
-
         try:
-            price_float = float(price_str)
-            if price_float <= 0: raise ValueError("Price must be positive.")
-        except (ValueError, TypeError):
-            print("!!! Validation Failed: Invalid price format.")
-            return jsonify({"error": "Invalid price format. Must be a positive number."}), 400
-
-        try:
-            stock_int = int(stock_str)
-            if stock_int < 0: raise ValueError("Stock cannot be negative.")
-        except (ValueError, TypeError):
-            print("!!! Validation Failed: Invalid stock format.")
-            return jsonify({"error": "Invalid stock format. Must be a non-negative integer."}), 400
+            product_fields = validate_product_fields(name, description, price_str, stock_str, category)
+        except ProductValidationError as e:
+            logger.debug("Product validation failed: %s", e)
+            return jsonify({"error": str(e)}), 400
 
         image_filename = None
         # Use the parsed file_data variable
         file = file_data.get('image')
         if file:
             if file.filename != '' and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                save_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-                file.save(save_path)
-                image_filename = filename
-                print(f"Image saved as: {filename}")
+                # Stored under the SHA-256 of its bytes, so identical uploads share one file
+                extension = file.filename.rsplit('.', 1)[1].lower()
+                image_filename, created = store_upload(file.stream, current_app.config['UPLOAD_FOLDER'], extension)
+                if created:
+                    # Thumbnail/card/detail derivatives are produced off the request path
+                    image_processor.submit(image_filename)
             elif file.filename != '':
-                 print("!!! Validation Failed: Invalid image file type.")
                  return jsonify({"error": "Invalid image file type. Allowed: png, jpg, jpeg, webp"}), 400
         else:
-             print("!!! Validation Failed: Image file is required.")
              return jsonify({"error": "Image file is required."}), 400
 
-        print("Validation Passed. Creating product...")
-        new_product = Product(
-            name=name, description=description, price=price_float, stock=stock_int,
-            image_url=image_filename, category=category
-        )
+        new_product = Product(image_url=image_filename, **product_fields)
 
         db.session.add(new_product)
         db.session.commit()
-        print("Product created successfully. ID:", new_product.id)
+        catalog_cache.bump_version()
+        logger.info("Product created", extra={"product_id": new_product.id, "image": image_filename})
         return jsonify(new_product.to_dict()), 201
 
     except Exception as e:
         db.session.rollback()
-        print(f"!!! FINAL EXCEPTION CAUGHT: {type(e).__name__} - {e}")
+        logger.exception("Product creation failed")
         return jsonify({"error": "An internal server error occurred", "details": str(e)}), 500
 
+@admin_api.route('/products/import', methods=['POST', 'OPTIONS'])
+@admin_required
+def import_products():
+    # Accepts either a raw CSV/NDJSON body (streamed, never buffered) or multipart with
+    # a 'file' part and an optional 'images' zip that rows reference by member name.
+    importer = None
+    try:
+        if request.mimetype == 'multipart/form-data':
+            upload = request.files.get('file')
+            if not upload:
+                return jsonify({"error": "Multipart imports need a 'file' part"}), 400
+            import_format = detect_format(request.args.get('format'), upload.mimetype, upload.filename)
+            source = upload.stream
+            images_zip = request.files.get('images')
+        else:
+            import_format = detect_format(request.args.get('format'), request.mimetype)
+            source = request.stream
+            images_zip = None
+
+        importer = ProductImporter(
+            current_app.config['UPLOAD_FOLDER'],
+            batch_size=current_app.config['IMPORT_BATCH_SIZE'],
+            max_errors=current_app.config['IMPORT_MAX_REPORTED_ERRORS'],
+            images_zip=images_zip.stream if images_zip else None
+        )
+        report = importer.run(iter_rows(open_lines(source), import_format))
+        status = 201 if report.inserted else 400
+        return jsonify(report.to_dict()), status
+    except (ValueError, zipfile.BadZipFile) as e:
+        # Malformed input that stops the import; whatever was committed is still reported
+        db.session.rollback()
+        return jsonify({"error": str(e), **(importer.report.to_dict() if importer else {})}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Product import failed")
+        return jsonify({"error": "An internal server error occurred during import", "details": str(e),
+                        **(importer.report.to_dict() if importer else {})}), 500
+    finally:
+        if importer is not None and importer.report.inserted:
+            catalog_cache.bump_version()
+
 # Ensure other admin routes also use the updated decorator logic if needed
 @admin_api.route('/products/<int:product_id>', methods=['DELETE', 'OPTIONS']) # Added OPTIONS
 @admin_required
@@ -152,36 +171,134 @@ def delete_product(product_id):
         if not product:
             return jsonify({"error": "Product not found"}), 404
 
-        if product.image_url:
-            try:
-                image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], product.image_url)
-                if os.path.exists(image_path):
-                    os.remove(image_path)
-            except Exception as e:
-                print(f"Warning: Could not delete image file {product.image_url}: {e}")
+        product_name = product.name
+        image_filename = product.image_url
 
+        # Cart and wishlist rows go with it through ON DELETE CASCADE
         db.session.delete(product)
         db.session.commit()
+        catalog_cache.bump_version()
+        upload_cleaner.submit([image_filename])
 
-        return jsonify({"message": f"Product '{product.name}' deleted successfully"}), 200
+        return jsonify({"message": f"Product '{product_name}' deleted successfully"}), 200
     except Exception as e:
         db.session.rollback()
-        print(f"Error during product deletion: {e}")
+        logger.exception("Product deletion failed", extra={"product_id": product_id})
         return jsonify({"error": "An internal server error occurred during deletion", "details": str(e)}), 500
 
+def bulk_delete_condition(data):
+    # {"ids": [...]} or {"filter": {...}} with the /products filter parameters
+    ids = data.get('ids')
+    product_filter = data.get('filter')
+    if (ids is None) == (product_filter is None):
+        raise ValueError("Send either 'ids' or 'filter'")
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            raise ValueError("'ids' must be a non-empty list of product ids")
+        if len(ids) > current_app.config['BULK_DELETE_MAX_IDS']:
+            raise ValueError(f"At most {current_app.config['BULK_DELETE_MAX_IDS']} ids per request; use a filter")
+        return Product.id.in_(set(ids))
+    if not isinstance(product_filter, dict):
+        raise ValueError("'filter' must be an object")
+    # The listing parser ignores what it does not understand; for a delete that would turn a
+    # typo into a wider match, so every key and value is checked strictly first
+    unknown = sorted(set(product_filter) - set(FILTER_KEYS))
+    if unknown:
+        raise ValueError(f"Unknown filter keys: {', '.join(unknown)}. Use: {', '.join(FILTER_KEYS)}")
+    args = MultiDict()
+    for key, value in product_filter.items():
+        values = value if key == 'category' and isinstance(value, list) else [value]
+        if not values:
+            raise ValueError(f"Filter '{key}' cannot be empty")
+        for item in values:
+            if key == 'category':
+                names = [name.strip() for name in item.split(',')] if isinstance(item, str) else []
+                if not names or not all(names) or 'All' in names:
+                    raise ValueError("Filter 'category' must be a category name or a list of them")
+            elif key == 'in_stock':
+                item = str(item).lower()
+                if item not in TRUE_VALUES + FALSE_VALUES:
+                    raise ValueError("Filter 'in_stock' must be true or false")
+            elif key in ('price_min', 'price_max'):
+                if isinstance(item, bool) or not isinstance(item, (int, float, str)):
+                    raise ValueError(f"Filter '{key}' must be a number")
+            elif not isinstance(item, str):
+                raise ValueError(f"Filter '{key}' must be an ISO-8601 date or datetime")
+            args.add(key, str(item))
+    conditions = filter_conditions(parse_catalog_filters(args))
+    if not conditions:
+        raise ValueError("The filter matches every product; refusing to delete the whole catalog")
+    return and_(*conditions)
+
+@admin_api.route('/products', methods=['DELETE'])
+@admin_required
+def bulk_delete_products():
+    try:
+        condition = bulk_delete_condition(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        # One statement: the database cascades to cart and wishlist rows and the facet/search
+        # triggers run per row, with no product or collection ever loaded into the session
+        deleted = db.session.execute(
+            delete(Product).where(condition).returning(Product.id, Product.image_url),
+            execution_options={'synchronize_session': False}
+        ).all()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Bulk product deletion failed")
+        return jsonify({"error": "An internal server error occurred during deletion", "details": str(e)}), 500
+
+    if deleted:
+        catalog_cache.bump_version()
+        upload_cleaner.submit({image_url for _, image_url in deleted})
+    logger.info("Bulk deleted products", extra={"deleted": len(deleted)})
+    return jsonify({"deleted": len(deleted), "ids": sorted(product_id for product_id, _ in deleted)}), 200
+
 @admin_api.route('/users', methods=['GET'])
 @admin_required
 def list_users():
     # Decorator handles OPTIONS if browser sends one for GET (unlikely but safe)
+    # For large user bases use /export/users, which streams instead of building the list
     try:
-        users = User.query.all()
-        user_list = []
-        for user in users:
-            user_list.append({
-                "id": user.id,
-                "email": user.email,
-                "is_admin": user.is_admin
-            })
+        rows = db.session.execute(db.select(User.id, User.email, User.is_admin).order_by(User.id))
+        user_list = [{"id": user_id, "email": email, "is_admin": is_admin} for user_id, email, is_admin in rows]
         return jsonify(user_list), 200
     except Exception as e:
-        return jsonify({"error": "An internal server error occurred", "details": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": "An internal server error occurred", "details": str(e)}), 500
+
+@admin_api.route('/export/<string:dataset>', methods=['GET'])
+@admin_required
+def export_dataset(dataset):
+    if dataset not in EXPORT_DATASETS:
+        return jsonify({"error": f"Unknown export '{dataset}'. Use one of: {', '.join(EXPORT_DATASETS)}"}), 404
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported export format '{export_format}'. Use csv or ndjson."}), 400
+
+    def generate():
+        try:
+            yield from stream_export(dataset, export_format, current_app.config['EXPORT_BATCH_SIZE'])
+        except Exception:
+            # Headers are already sent; all that can be done is to end the body early
+            logger.exception("Export failed mid-stream", extra={"dataset": dataset})
+
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="shopease-{dataset}.{export_format}"'
+    response.cache_control.no_store = True
+    return response
+
+@admin_api.route('/metrics', methods=['GET'])
+@admin_required
+def metrics():
+    # Prometheus text exposition format; counters are per process
+    return Response(request_metrics.render_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@admin_api.route('/metrics/slow-requests', methods=['GET'])
+@admin_required
+def slow_requests():
+    return jsonify({
+        "threshold_seconds": request_metrics.slow_threshold,
+        "requests": request_metrics.slow_requests()
+    }), 200
@@ -1,47 +1,174 @@
-from flask import Blueprint, jsonify, url_for, request
+from flask import Blueprint, jsonify, request, current_app
+from sqlalchemy import select
+from extensions import catalog_cache, response_compressor
 from models import Product
+from database import execute_read
+from search import search_products, SearchIndexUnavailable
+from facets import load_facets, facet_totals, FacetsUnavailable
+from images import expand_image_urls, upload_url_prefix
+from catalog_query import (
+    SORT_OPTIONS, parse_fields, parse_limit, parse_sort, parse_catalog_filters,
+    encode_cursor, decode_cursor, build_catalog_query, build_count_query, sort_value
+)
 
 product_api = Blueprint('product_api', __name__)
 
+# --- Catalog listing helpers ---
+def cached_json_entry(key, build):
+    # Returns (entry, None) on success, or (None, (payload, status)) when build() did not return 200
+    # Read the generation once, before building, so a write made meanwhile by any worker
+    # cannot be cached as current
+    version = catalog_cache.current_version()
+    entry = catalog_cache.get(key, version)
+    if entry is None:
+        payload, status = build()
+        if status != 200:
+            return None, (payload, status)
+        entry = catalog_cache.set(key, current_app.json.dumps(payload).encode('utf-8'), version)
+    return entry, None
+
+def cached_json_response(key, build):
+    entry, error = cached_json_entry(key, build)
+    if error:
+        payload, status = error
+        return jsonify(payload), status
+
+    body, encoding = response_compressor.cached_body(entry, response_compressor.negotiate(), catalog_cache)
+    response = current_app.response_class(body, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.content_encoding = encoding
+        response.set_etag(f"{entry.etag}-{encoding}")
+    else:
+        response.set_etag(entry.etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def serialize_product_row(row, fields, url_prefix):
+    prod_dict = {}
+    for field in fields:
+        value = getattr(row, field)
+        if field == 'date_added' and value is not None:
+            value = value.isoformat()
+        prod_dict[field] = value
+    return expand_image_urls(prod_dict, url_prefix)
+# --- End catalog listing helpers ---
+
+def catalog_listing(args, paginate=None):
+    # Parses a listing query string into (cache key, build); raises ValueError on bad input
+    after = args.get('after')
+    # Keyset pagination is opt-in so existing clients keep receiving a plain array
+    if paginate is None:
+        paginate = 'limit' in args or after is not None
+
+    fields = parse_fields(args.get('fields'))
+    filters = parse_catalog_filters(args)
+    sort = parse_sort(args.get('sort')) if paginate or 'sort' in args else None
+    limit = parse_limit(args.get('limit'))
+    cursor = decode_cursor(after, sort) if after else None
+
+    def build():
+        # Only the requested columns are selected; id and the sort column are needed for the cursor
+        extra = ('id', SORT_OPTIONS[sort][0]) if sort else ()
+        selected = tuple(dict.fromkeys(fields + extra))
+        columns = [getattr(Product, f) for f in selected]
+        url_prefix = upload_url_prefix()
+
+        if not paginate:
+            rows = execute_read(build_catalog_query(columns, filters, sort)).all()
+            return [serialize_product_row(r, fields, url_prefix) for r in rows], 200
+
+        rows = execute_read(build_catalog_query(columns, filters, sort, cursor, limit + 1)).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(sort, sort_value(rows[-1], sort), rows[-1].id) if has_more else None
+
+        payload = {
+            "items": [serialize_product_row(r, fields, url_prefix) for r in rows],
+            "next_cursor": next_cursor,
+            "limit": limit,
+            "sort": sort
+        }
+        # The total only depends on the filters, so it is computed once, on the first page
+        if cursor is None:
+            payload["total"] = (len(rows) if not has_more
+                                else execute_read(build_count_query(filters)).scalar())
+        return payload, 200
+
+    key = ('list', fields, tuple(filters.items()), sort, paginate, limit, after)
+    return key, build
+
 @product_api.route('/products', methods=['GET'])
 def get_all_products():
     # 2nd Navigation Bar with Categories - filtering is done here
-    category = request.args.get('category')
-    
     try:
-        if category and category != 'All':
-            products = Product.query.filter_by(category=category).all()
-        else:
-            products = Product.query.all()
+        key, build = catalog_listing(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        return cached_json_response(key, build)
+    except Exception as e:
+        return jsonify({"error": "An internal server error occurred", "details": str(e)}), 500
+
+@product_api.route('/products/facets', methods=['GET'])
+def get_product_facets():
+    # Read from the trigger-maintained summary table: one row per category
+    def build():
+        facets = load_facets()
+        return {"categories": facets, "total": facet_totals(facets)}, 200
+
+    try:
+        return cached_json_response(('facets',), build)
+    except FacetsUnavailable as e:
+        return jsonify({"error": str(e), "details": "Run 'flask db upgrade'"}), 503
+    except Exception as e:
+        return jsonify({"error": "An internal server error occurred", "details": str(e)}), 500
+
+@product_api.route('/products/search', methods=['GET'])
+def search_catalog():
+    query_text = request.args.get('q', '').strip()
+    if not query_text:
+        return jsonify({"error": "Search query 'q' is required"}), 400
 
-        product_list = [p.to_dict() for p in products]
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        limit = parse_limit(request.args.get('limit'))
+        offset = int(request.args.get('offset', 0))
+        if offset < 0:
+            raise ValueError("offset cannot be negative")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        # Augment Image URL (No hardcoding of image path)
-        for prod_dict in product_list:
-            if prod_dict['image_url']:
-                prod_dict['image_url'] = url_for('serve_upload',
-                                                filename=prod_dict['image_url'],
-                                                _external=True)
+    def build():
+        columns = (getattr(Product, f) for f in fields)
+        rows = search_products(query_text, columns, limit + 1, offset)
+        has_more = len(rows) > limit
+        url_prefix = upload_url_prefix()
+        return {
+            "items": [serialize_product_row(r, fields, url_prefix) for r in rows[:limit]],
+            "next_offset": offset + limit if has_more else None,
+            "limit": limit
+        }, 200
 
-        return jsonify(product_list), 200
+    try:
+        key = ('search', query_text.lower(), fields, limit, offset)
+        return cached_json_response(key, build)
+    except SearchIndexUnavailable as e:
+        return jsonify({"error": str(e), "details": "Run 'flask search-index rebuild'"}), 503
     except Exception as e:
         return jsonify({"error": "An internal server error occurred", "details": str(e)}), 500
 
 @product_api.route('/products/<int:product_id>', methods=['GET'])
 def get_product_details(product_id):
-    try:
-        product = Product.query.get(product_id)
+    def build():
+        product = execute_read(select(Product).where(Product.id == product_id)).scalar()
         if not product:
-            return jsonify({"error": "Product not found"}), 404
-
-        prod_dict = product.to_dict()
+            return {"error": "Product not found"}, 404
 
-        if prod_dict['image_url']:
-            prod_dict['image_url'] = url_for('serve_upload',
-                                            filename=prod_dict['image_url'],
-                                            _external=True)
-
-        return jsonify(prod_dict), 200
+        return product.to_dict(upload_url_prefix()), 200
 
+    try:
+        return cached_json_response(('detail', product_id), build)
     except Exception as e:
-        return jsonify({"error": "An internal server error occurred", "details": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": "An internal server error occurred", "details": str(e)}), 500
@@ -1,10 +1,39 @@
-from flask import Blueprint, request, jsonify
-from extensions import db, bcrypt # Removed 'cors' import since it's not needed here
+import logging
+from flask import Blueprint, request, jsonify, current_app
+from extensions import db, password_hasher # Removed 'cors' import since it's not needed here
 from models import User, Product, CartItem, WishlistItem
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from sqlalchemy.orm import joinedload
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt, get_jwt_identity, verify_jwt_in_request
+from sql_tracking import query_budget
+from hashing import HashingBusy
+from security import admin_status_cache, token_blocklist
+from cart import (CartError, add_item, set_quantity, apply_operations, load_cart, load_cart_item,
+                  load_cart_lines, cart_summary)
+from routes.product_routes import catalog_listing, cached_json_entry
+from images import upload_url_prefix
 
 user_api = Blueprint('user_api', __name__)
+logger = logging.getLogger(__name__)
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+def compact_requested():
+    return (request.args.get('compact') or '').lower() in TRUE_VALUES
+
+def wishlist_product_ids(user_id):
+    return db.session.execute(
+        select(WishlistItem.product_id)
+        .where(WishlistItem.user_id == user_id)
+        .order_by(WishlistItem.id)
+    ).scalars().all()
+
+def hashing_busy_response(e):
+    response = jsonify({"error": "Server is busy, please retry shortly"})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
 
 @user_api.route('/register', methods=['POST', 'OPTIONS'])
 def register():
@@ -21,13 +50,15 @@ def register():
         if User.query.filter_by(email=email).first():
             return jsonify({"error": "Email address already in use"}), 409
             
-        password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        password_hash = password_hasher.generate_password_hash(password)
         new_user = User(email=email, password_hash=password_hash, is_admin=False) 
 
         db.session.add(new_user)
         db.session.commit()
 
         return jsonify({"message": "User registered successfully"}), 201
+    except HashingBusy as e:
+        return hashing_busy_response(e)
     except IntegrityError:
         db.session.rollback()
         return jsonify({"error": "Email address already in use"}), 409
@@ -45,16 +76,26 @@ def authenticate_user(email, password, required_admin_status):
 
     user = User.query.filter_by(email=email).first()
 
-    if not user or not bcrypt.check_password_hash(user.password_hash, password):
+    if not user or not password_hasher.check_password_hash(user.password_hash, password):
         return jsonify({"error": "Invalid credentials"}), 401
 
     if user.is_admin != required_admin_status:
         role = "Admin" if required_admin_status else "User"
         return jsonify({"error": f"Invalid credentials for a {role} account"}), 401
 
+    # Transparently upgrade hashes created with a different work factor
+    if password_hasher.needs_rehash(user.password_hash):
+        try:
+            user.password_hash = password_hasher.generate_password_hash(password)
+            db.session.commit()
+        except HashingBusy:
+            db.session.rollback()
+
     user_id_str = str(user.id) 
-    print(f"DEBUG: Creating token with STRING identity: {user_id_str}, type: {type(user_id_str)}")
-    access_token = create_access_token(identity=user_id_str) 
+    logger.debug("Issuing access token", extra={"user_id": user.id, "is_admin": bool(user.is_admin)})
+    admin_status_cache.set(user.id, user.is_admin)
+    access_token = create_access_token(identity=user_id_str,
+                                       additional_claims={"is_admin": bool(user.is_admin)})
     return jsonify({
         "message": "Login successful",
         "access_token": access_token,
@@ -75,6 +116,8 @@ def user_login():
         password = data.get('password') if data else None
         
         return authenticate_user(email, password, False)
+    except HashingBusy as e:
+        return hashing_busy_response(e)
     except Exception as e:
         return jsonify({"error": "An internal server error occurred", "details": str(e)}), 500
 
@@ -88,22 +131,36 @@ def admin_login():
         password = data.get('password') if data else None
         
         return authenticate_user(email, password, True)
+    except HashingBusy as e:
+        return hashing_busy_response(e)
     except Exception as e:
         return jsonify({"error": "An internal server error occurred", "details": str(e)}), 500
 
 @user_api.route('/logout', methods=['POST'])
+@jwt_required(optional=True)
 def logout():
+    claims = get_jwt()
+    if claims.get('jti'):
+        token_blocklist.revoke(claims['jti'], claims.get('exp') or float('inf'))
     return jsonify({"message": "Logout successful. Please delete your token."}), 200
 
 @user_api.route('/cart', methods=['GET'])
+@query_budget(1)
 @jwt_required()
 def get_cart():
     current_user_id = get_jwt_identity()
-    cart_items = CartItem.query.filter_by(user_id=current_user_id).all()
+    if compact_requested():
+        return jsonify(load_cart_lines(current_user_id)), 200
 
-    return jsonify([item.to_dict() for item in cart_items]), 200
+    cart_items = (CartItem.query.options(joinedload(CartItem.product))
+                  .filter_by(user_id=current_user_id).all())
+
+    url_prefix = upload_url_prefix()
+    return jsonify([item.to_dict(url_prefix) for item in cart_items]), 200
 
 @user_api.route('/cart', methods=['POST'])
+# A new line costs UPDATE, SAVEPOINT, INSERT and RELEASE before the item is read back
+@query_budget(5)
 @jwt_required()
 def add_to_cart():
     current_user_id = get_jwt_identity()
@@ -114,25 +171,48 @@ def add_to_cart():
     if not product_id or not isinstance(quantity_to_add, int) or quantity_to_add <= 0:
         return jsonify({"error": "Invalid product ID or quantity"}), 400
     
-    product = Product.query.get(product_id)
-    if not product:
-        return jsonify({"error": "Product not found"}), 404
-
-    cart_item = CartItem.query.filter_by(user_id=current_user_id, product_id=product_id).first()
-    
-    if cart_item:
-        new_quantity = cart_item.quantity + quantity_to_add
-        if new_quantity > product.stock:
-            return jsonify({"error": "Not enough stock available"}), 400
-        cart_item.quantity = new_quantity
-    else:
-        if quantity_to_add > product.stock:
-            return jsonify({"error": "Not enough stock available"}), 400
-        cart_item = CartItem(user_id=current_user_id, product_id=product_id, quantity=quantity_to_add)
-        db.session.add(cart_item)
+    try:
+        add_item(int(current_user_id), product_id, quantity_to_add)
+    except CartError as e:
+        db.session.rollback()
+        return jsonify({"error": e.message}), e.status_code
 
+    # Serialize before commit: commit expires every instance and would reload item and product
+    item_dict = load_cart_item(int(current_user_id), product_id=product_id).to_dict()
     db.session.commit()
-    return jsonify(cart_item.to_dict()), 200
+    return jsonify(item_dict), 200
+
+@user_api.route('/cart', methods=['PATCH', 'OPTIONS'])
+@jwt_required()
+def update_cart():
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    try:
+        current_user_id = int(get_jwt_identity())
+    except (ValueError, TypeError):
+        return jsonify({"error": "Invalid user identity in token"}), 401
+
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"error": "'operations' must be a non-empty list"}), 400
+    if len(operations) > current_app.config['CART_MAX_OPERATIONS']:
+        return jsonify({"error": f"At most {current_app.config['CART_MAX_OPERATIONS']} operations per request"}), 400
+
+    try:
+        # All operations succeed together or none are applied
+        apply_operations(current_user_id, operations)
+        url_prefix = upload_url_prefix()
+        cart = [item.to_dict(url_prefix) for item in load_cart(current_user_id)]
+        db.session.commit()
+        return jsonify(cart), 200
+    except CartError as e:
+        db.session.rollback()
+        return jsonify({"error": e.message, "operation": e.operation_index}), e.status_code
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "An internal server error occurred", "details": str(e)}), 500
 
 @user_api.route('/cart/<int:item_id>', methods=['DELETE'])
 @jwt_required()
@@ -156,12 +236,19 @@ def remove_from_cart(item_id):
     return jsonify({"message": "Item removed from cart"}), 200
 
 @user_api.route('/wishlist', methods=['GET'])
+@query_budget(1)
 @jwt_required()
 def get_wishlist():
     current_user_id = get_jwt_identity()
-    wishlist_items = WishlistItem.query.filter_by(user_id=current_user_id).all()
+    if compact_requested():
+        # Product ids only; the storefront just needs to know what is wishlisted
+        return jsonify(wishlist_product_ids(current_user_id)), 200
 
-    return jsonify([item.to_dict() for item in wishlist_items]), 200
+    wishlist_items = (WishlistItem.query.options(joinedload(WishlistItem.product))
+                      .filter_by(user_id=current_user_id).all())
+
+    url_prefix = upload_url_prefix()
+    return jsonify([item.to_dict(url_prefix) for item in wishlist_items]), 200
 
 @user_api.route('/wishlist', methods=['POST'])
 @jwt_required()
@@ -201,6 +288,7 @@ def remove_from_wishlist(product_id):
     return jsonify({"message": "Item removed from wishlist"}), 200
     
 @user_api.route('/cart/<int:item_id>', methods=['PUT', 'OPTIONS'])
+@query_budget(2)
 @jwt_required()
 def update_cart_item(item_id):
     if request.method == 'OPTIONS':
@@ -213,32 +301,62 @@ def update_cart_item(item_id):
         except (ValueError, TypeError):
             return jsonify({"error": "Invalid user identity in token"}), 401
 
-        cart_item = CartItem.query.get(item_id)
-
-        if not cart_item:
-            return jsonify({"error": "Cart item not found"}), 404
-
-        if cart_item.user_id != current_user_id:
-            return jsonify({"error": "Unauthorized"}), 403
-
         data = request.get_json()
         new_quantity = data.get('quantity')
 
         if not isinstance(new_quantity, int) or new_quantity < 1:
             return jsonify({"error": "Invalid quantity provided"}), 400
 
-        product = Product.query.get(cart_item.product_id)
-        if not product:
-            return jsonify({"error": "Associated product not found"}), 404
-        if new_quantity > product.stock:
-            return jsonify({"error": f"Not enough stock available ({product.stock} left)"}), 400
+        try:
+            set_quantity(current_user_id, new_quantity, item_id=item_id)
+        except CartError as e:
+            db.session.rollback()
+            return jsonify({"error": e.message}), e.status_code
 
-        cart_item.quantity = new_quantity
+        item_dict = load_cart_item(current_user_id, item_id=item_id).to_dict()
         db.session.commit()
 
-        return jsonify(cart_item.to_dict()), 200
+        return jsonify(item_dict), 200
 
     except Exception as e:
         db.session.rollback()
-        print(f"Error updating cart item: {e}")
+        logger.exception("Cart item update failed", extra={"item_id": item_id})
+        return jsonify({"error": "An internal server error occurred", "details": str(e)}), 500
+
+@user_api.route('/session/bootstrap', methods=['GET'])
+@query_budget(4)
+def session_bootstrap():
+    # Everything the storefront needs on load in one round trip: the first catalog page
+    # (accepts the same query parameters as /products), plus wishlist ids and a cart
+    # summary when a valid token is sent.
+    try:
+        verify_jwt_in_request(optional=True)
+        user_id = get_jwt_identity()
+    except Exception as e:
+        return jsonify({"error": f"Authentication Error: {str(e)}"}), 401
+
+    try:
+        key, build = catalog_listing(request.args, paginate=True)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        entry, error = cached_json_entry(key, build)
+        if error:
+            payload, status = error
+            return jsonify(payload), status
+
+        session = {
+            "authenticated": user_id is not None,
+            "wishlist_ids": wishlist_product_ids(user_id) if user_id else [],
+            "cart": cart_summary(user_id) if user_id else None
+        }
+        # The catalog page is spliced in as the cached, already-serialized bytes
+        body = current_app.json.dumps(session).encode('utf-8')
+        body = body[:-1] + b', "catalog": ' + entry.body + b'}'
+        response = current_app.response_class(body, mimetype='application/json')
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    except Exception as e:
         return jsonify({"error": "An internal server error occurred", "details": str(e)}), 500
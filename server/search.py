@@ -0,0 +1,100 @@
+import re
+from flask.cli import AppGroup
+from sqlalchemy import event, func, literal_column, or_, select
+from sqlalchemy.sql import table, column
+from extensions import db
+from models import Product
+from database import execute_read
+
+SEARCH_TABLE = 'product_fts'
+
+# External-content FTS5 index over product; triggers keep it in step with every
+# insert/update/delete, whether it comes from the ORM or a bulk statement.
+SEARCH_INDEX_DDL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        name, description, category,
+        content='product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE OF name, description, category ON product BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+        INSERT INTO {SEARCH_TABLE}(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END""",
+)
+
+# bm25 column weights: name, description, category
+BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+search_table = table(SEARCH_TABLE, column('rowid'))
+
+class SearchIndexUnavailable(Exception):
+    pass
+
+def install_search_index(connection):
+    if connection.dialect.name != 'sqlite':
+        return
+    for statement in SEARCH_INDEX_DDL:
+        connection.exec_driver_sql(statement)
+
+def rebuild_search_index(connection):
+    install_search_index(connection)
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+@event.listens_for(Product.__table__, 'after_create')
+def _create_search_index(target, connection, **kw):
+    install_search_index(connection)
+
+def build_match_query(raw_query):
+    # Quote every term so user input can never inject FTS5 syntax; each term is prefix-matched
+    terms = TERM_RE.findall(raw_query or '')
+    return ' AND '.join(f'"{term}"*' for term in terms)
+
+def search_products(raw_query, columns, limit, offset):
+    match = build_match_query(raw_query)
+    if not match:
+        return []
+
+    if db.engine.dialect.name != 'sqlite':
+        pattern = f"%{raw_query.strip()}%"
+        query = (select(*columns)
+                 .where(or_(Product.name.ilike(pattern),
+                            Product.description.ilike(pattern),
+                            Product.category.ilike(pattern)))
+                 .order_by(Product.id)
+                 .limit(limit).offset(offset))
+        return execute_read(query).all()
+
+    fts = literal_column(SEARCH_TABLE)
+    query = (select(*columns)
+             .select_from(search_table)
+             .join(Product, Product.id == search_table.c.rowid)
+             .where(fts.op('MATCH')(match))
+             .order_by(func.bm25(fts, *BM25_WEIGHTS))
+             .limit(limit).offset(offset))
+    try:
+        return execute_read(query).all()
+    except Exception as e:
+        if f'no such table: {SEARCH_TABLE}' in str(e):
+            db.session.rollback()
+            raise SearchIndexUnavailable("Search index has not been built")
+        raise
+
+search_cli = AppGroup('search-index', help='Manage the product full-text search index.')
+
+@search_cli.command('rebuild')
+def rebuild_command():
+    with db.engine.begin() as connection:
+        rebuild_search_index(connection)
+    print("Search index rebuilt.")
@@ -0,0 +1,147 @@
+import threading
+import time
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from cache import LRUCache
+from models import User
+from sqlite_store import SQLiteConnections, sqlite_path
+
+class SharedAuthState:
+    # Revoked tokens and admin-status changes in a side SQLite file, so a logout or a demotion
+    # handled by one worker process is seen by all of them
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS revoked_token (jti TEXT PRIMARY KEY, expires_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS admin_status_change ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, changed_at REAL NOT NULL)",
+    )
+
+    def __init__(self, path):
+        self.connections = SQLiteConnections(path)
+        connection = self.connections.get()
+        for statement in self.SCHEMA:
+            connection.execute(statement)
+
+    def revoke(self, jti, expires_at):
+        connection = self.connections.get()
+        connection.execute("INSERT OR REPLACE INTO revoked_token(jti, expires_at) VALUES (?, ?)", (jti, expires_at))
+        connection.execute("DELETE FROM revoked_token WHERE expires_at <= ?", (time.time(),))
+
+    def is_revoked(self, jti):
+        row = self.connections.get().execute(
+            "SELECT 1 FROM revoked_token WHERE jti = ? AND expires_at > ?", (jti, time.time())).fetchone()
+        return row is not None
+
+    def publish_admin_change(self, user_id, keep_seconds):
+        connection = self.connections.get()
+        now = time.time()
+        connection.execute("INSERT INTO admin_status_change(user_id, changed_at) VALUES (?, ?)", (user_id, now))
+        # Older changes have outlived every worker's cache entry anyway
+        connection.execute("DELETE FROM admin_status_change WHERE changed_at < ?", (now - keep_seconds,))
+
+    def admin_changes_since(self, last_id):
+        rows = self.connections.get().execute(
+            "SELECT id, user_id FROM admin_status_change WHERE id > ? ORDER BY id", (last_id,)).fetchall()
+        return (rows[-1][0] if rows else last_id), [user_id for _, user_id in rows]
+
+    def last_admin_change(self):
+        return self.admin_changes_since(0)[0]
+
+class AdminStatusCache:
+    def __init__(self):
+        self.entries = LRUCache(maxsize=10000, ttl=60)
+        self.shared = None
+        self._seen_change = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app, shared=None):
+        self.entries.ttl = app.config.get('ADMIN_STATUS_CACHE_TTL', 60)
+        self.shared = shared
+        if shared is not None:
+            self._seen_change = shared.last_admin_change()
+        app.extensions['admin_status_cache'] = self
+
+    def _sync(self):
+        # Drop entries other workers have invalidated since the last look; one indexed query
+        with self._lock:
+            self._seen_change, user_ids = self.shared.admin_changes_since(self._seen_change)
+        for user_id in user_ids:
+            self.entries.pop(user_id)
+
+    def is_admin(self, user_id, loader):
+        if self.shared is not None:
+            self._sync()
+        status = self.entries.get(user_id)
+        if status is None:
+            status = bool(loader(user_id))
+            self.entries.set(user_id, status)
+        return status
+
+    def set(self, user_id, status):
+        self.entries.set(user_id, bool(status))
+
+    def invalidate(self, user_id):
+        self.entries.pop(user_id)
+        if self.shared is not None:
+            self.shared.publish_admin_change(user_id, keep_seconds=max(self.entries.ttl or 0, 60) * 2)
+
+class TokenBlocklist:
+    def __init__(self):
+        self._revoked = {}
+        self._lock = threading.Lock()
+        self.shared = None
+
+    def init_app(self, app, shared=None):
+        self.shared = shared
+        app.extensions['token_blocklist'] = self
+
+    def revoke(self, jti, expires_at):
+        with self._lock:
+            self._revoked[jti] = expires_at
+        if self.shared is not None:
+            self.shared.revoke(jti, expires_at)
+
+    def is_revoked(self, jti):
+        now = time.time()
+        with self._lock:
+            expires_at = self._revoked.get(jti)
+            if expires_at is not None and expires_at <= now:
+                # Expired tokens are rejected by signature checks anyway; drop them from the list
+                self._revoked = {k: v for k, v in self._revoked.items() if v > now}
+                return False
+            if expires_at is not None:
+                return True
+        # Revoked by another worker process
+        return self.shared is not None and self.shared.is_revoked(jti)
+
+def init_auth_state(app):
+    # 'memory' keeps revocations and admin invalidations in this process only
+    path = sqlite_path(app.config.get('AUTH_STATE_STORAGE'))
+    shared = SharedAuthState(path) if path else None
+    admin_status_cache.init_app(app, shared)
+    token_blocklist.init_app(app, shared)
+    return shared
+
+admin_status_cache = AdminStatusCache()
+token_blocklist = TokenBlocklist()
+
+# --- Role-change invalidation ---
+# Collect users whose admin flag changed (or who were deleted) during a flush and
+# drop their cached status only once the transaction actually commits.
+@event.listens_for(Session, 'after_flush')
+def _collect_role_changes(session, flush_context):
+    changed = session.info.setdefault('admin_status_changed', set())
+    for obj in session.dirty:
+        if isinstance(obj, User) and inspect(obj).attrs.is_admin.history.has_changes():
+            changed.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed.add(obj.id)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_role_changes(session):
+    for user_id in session.info.pop('admin_status_changed', ()):
+        admin_status_cache.invalidate(user_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_role_changes(session):
+    session.info.pop('admin_status_changed', None)
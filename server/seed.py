@@ -0,0 +1,66 @@
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from extensions import db
+from hashing import _hash_password
+from models import User, Product, CartItem, WishlistItem
+
+CATEGORIES = ('Furniture', 'Clothes', 'Stationary')
+WORDS = ('oak', 'pine', 'walnut', 'teak', 'chair', 'table', 'desk', 'sofa', 'shelf', 'lamp',
+         'shirt', 'jeans', 'jacket', 'scarf', 'hoodie', 'pencil', 'marker', 'notebook', 'planner',
+         'classic', 'modern', 'compact', 'deluxe', 'cotton', 'linen', 'leather', 'steel', 'blue',
+         'green', 'black', 'white', 'grey', 'ergonomic', 'vintage', 'premium', 'travel')
+SEED_PASSWORD = 'password123'
+ADMIN_EMAIL = 'admin@example.com'
+
+def _batched_insert(model, rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(insert(model), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(model), batch)
+    db.session.commit()
+
+def seed_database(products=100000, users=50000, cart_users=None, items_per_cart=5,
+                  items_per_wishlist=5, rounds=4, seed=42, batch_size=5000):
+    # Synthetic but deterministic data set; every user shares SEED_PASSWORD
+    rng = random.Random(seed)
+    cart_users = users // 2 if cart_users is None else cart_users
+    password_hash = _hash_password(SEED_PASSWORD, rounds)
+    started = datetime(2024, 1, 1)
+
+    def product_rows():
+        for i in range(products):
+            words = rng.sample(WORDS, 3)
+            yield {
+                'name': ' '.join(words).title(),
+                'description': ' '.join(rng.choices(WORDS, k=16)),
+                'price': round(rng.uniform(50, 50000), 2),
+                'stock': rng.choice((0, 1, 5, 10, 25, 100)),
+                'image_url': None,
+                'date_added': started + timedelta(minutes=i),
+                'category': rng.choice(CATEGORIES),
+            }
+
+    def user_rows():
+        yield {'email': ADMIN_EMAIL, 'password_hash': password_hash, 'is_admin': True}
+        for i in range(users):
+            yield {'email': f'user{i}@example.com', 'password_hash': password_hash, 'is_admin': False}
+
+    def line_item_rows(per_user, with_quantity):
+        for user_id in range(2, cart_users + 2):
+            for product_id in rng.sample(range(1, products + 1), min(per_user, products)):
+                row = {'user_id': user_id, 'product_id': product_id}
+                if with_quantity:
+                    row['quantity'] = 1
+                yield row
+
+    _batched_insert(Product, product_rows(), batch_size)
+    _batched_insert(User, user_rows(), batch_size)
+    _batched_insert(CartItem, line_item_rows(items_per_cart, True), batch_size)
+    _batched_insert(WishlistItem, line_item_rows(items_per_wishlist, False), batch_size)
+    return {'products': products, 'users': users + 1,
+            'cart_items': cart_users * items_per_cart, 'wishlist_items': cart_users * items_per_wishlist}
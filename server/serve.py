@@ -0,0 +1,226 @@
+"""Production server: a preforking master with a thread pool in every worker.
+
+The master builds the app once, warms the catalog cache, binds the listening
+socket and forks WEB_WORKERS children that all accept on it. Crashed workers
+are replaced; SIGTERM/SIGINT stop accepting, let in-flight requests finish for
+up to GRACEFUL_TIMEOUT seconds, then exit.
+
+Workers share no memory. With more than one worker, token revocation and admin
+demotion must go through AUTH_STATE_STORAGE=sqlite:///path and the catalog cache
+generation through CATALOG_CACHE_STORAGE=sqlite:///path (the server refuses to
+start otherwise). Both may name the same file.
+
+    AUTH_STATE_STORAGE=sqlite:////var/lib/shopease/shared.db \
+    CATALOG_CACHE_STORAGE=sqlite:////var/lib/shopease/shared.db \
+        python serve.py --host 0.0.0.0 --port 5000 --workers 4 --threads 8
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+logger = logging.getLogger('serve')
+
+class PooledWSGIServer(BaseWSGIServer):
+    # One accept loop per worker; requests run on a fixed pool instead of a thread each
+    multithread = True
+
+    def __init__(self, host, port, app, fd, threads):
+        super().__init__(host, port, app, handler=QuietRequestHandler, fd=fd)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='http')
+        # Stop accepting while every thread is busy, so the backlog queues in the kernel
+        # where the other workers can pick it up
+        self.slots = threading.BoundedSemaphore(threads)
+
+    def process_request(self, request, client_address):
+        self.slots.acquire()
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            request.setblocking(True)
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+
+    def drain(self):
+        self.pool.shutdown(wait=True)
+        self.server_close()
+
+class QuietRequestHandler(WSGIRequestHandler):
+    # Access logging is the metrics middleware's job; werkzeug's per-line log is skipped
+    def log_request(self, *args, **kwargs):
+        pass
+
+def bind_socket(host, port, backlog):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    # Every worker polls the same socket; the losers of an accept race must not block
+    sock.setblocking(False)
+    sock.set_inheritable(True)
+    return sock
+
+def warm_up(app, paths):
+    from extensions import db
+    from models import Product
+
+    with app.app_context():
+        categories = [c for (c,) in db.session.query(Product.category).distinct() if c]
+    client = app.test_client()
+    started = time.perf_counter()
+    for path in paths:
+        client.get(path)
+        for category in categories:
+            separator = '&' if '?' in path else '?'
+            client.get(f'{path}{separator}category={category}')
+    logger.info("Warmed catalog cache", extra={"paths": len(paths) * (len(categories) + 1),
+                                               "seconds": round(time.perf_counter() - started, 3)})
+
+def dispose_engines(app, close=True):
+    from extensions import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False drops the pool without closing connections the parent still owns
+            engine.dispose(close=close)
+
+def run_worker(app, sock, host, port, threads):
+    from extensions import log_pipeline
+
+    log_pipeline.restart()
+    dispose_engines(app, close=False)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    server = PooledWSGIServer(host, port, app, sock.fileno(), threads)
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever, which runs on this thread, so ask from another
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    logger.info("Worker started", extra={"pid": os.getpid(), "threads": threads})
+    try:
+        server.serve_forever(poll_interval=0.5)
+    finally:
+        server.drain()
+        logger.info("Worker stopped", extra={"pid": os.getpid()})
+        log_pipeline.stop()
+
+class Master:
+    def __init__(self, app, sock, args):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.workers = {}
+        self.stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            # Drop the master's handlers before anything else can deliver a signal
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            status = 0
+            try:
+                run_worker(self.app, self.sock, self.args.host, self.args.port, self.args.threads)
+            except BaseException:
+                logger.exception("Worker crashed")
+                status = 1
+            finally:
+                os._exit(status)
+        self.workers[pid] = time.monotonic()
+
+    def stop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info("Shutting down", extra={"signal": signal.Signals(signum).name})
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.args.workers):
+            self.spawn()
+
+        deadline = None
+        while self.workers:
+            if self.stopping and deadline is None:
+                deadline = time.monotonic() + self.args.graceful_timeout
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                if deadline is not None and time.monotonic() > deadline:
+                    for worker in list(self.workers):
+                        os.kill(worker, signal.SIGKILL)
+                    deadline = float('inf')
+                time.sleep(0.2)
+                continue
+
+            started = self.workers.pop(pid, None)
+            if self.stopping or started is None:
+                continue
+            logger.warning("Worker exited unexpectedly; restarting",
+                           extra={"pid": pid, "exit_status": os.waitstatus_to_exitcode(status)})
+            # A worker that dies straight away would otherwise be respawned in a tight loop
+            if time.monotonic() - started < 1:
+                time.sleep(1)
+            self.spawn()
+        self.sock.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=os.environ.get('SERVER_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('SERVER_PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 8)))
+    parser.add_argument('--backlog', type=int, default=int(os.environ.get('WEB_BACKLOG', 2048)))
+    parser.add_argument('--graceful-timeout', type=float, default=float(os.environ.get('GRACEFUL_TIMEOUT', 30)))
+    parser.add_argument('--warm-path', action='append', dest='warm_paths',
+                        help='catalog path to prefetch, once plain and once per category (repeatable)')
+    args = parser.parse_args(argv)
+
+    from app import create_app
+
+    app = create_app()
+    if args.workers > 1 and app.config.get('AUTH_STATE_STORAGE', 'memory') == 'memory':
+        # Each worker would keep its own blocklist: a logged-out token or a demoted admin would
+        # still be accepted by every worker except the one that handled the change
+        parser.error("--workers > 1 needs AUTH_STATE_STORAGE=sqlite:///path so token revocation and "
+                     "admin demotion reach every worker (or run with --workers 1)")
+    if args.workers > 1 and app.config.get('CATALOG_CACHE_STORAGE', 'memory') == 'memory':
+        # Only the worker that handled a product write would stop serving the old catalog
+        parser.error("--workers > 1 needs CATALOG_CACHE_STORAGE=sqlite:///path so catalog writes "
+                     "reach every worker's cache (or run with --workers 1)")
+    if args.workers > 1 and app.config.get('RATE_LIMIT_STORAGE', 'memory') == 'memory':
+        logger.warning("RATE_LIMIT_STORAGE is per process; each worker enforces the limits separately",
+                       extra={"workers": args.workers})
+    sock = bind_socket(args.host, args.port, args.backlog)
+    # Cache entries built here are inherited by every worker through fork
+    warm_up(app, args.warm_paths or ['/api/products', '/api/products?limit=24'])
+    # No connection opened by the master may be shared with a worker
+    dispose_engines(app)
+    logger.info("Listening", extra={"address": f"{args.host}:{args.port}", "workers": args.workers,
+                                    "threads": args.threads})
+    Master(app, sock, args).run()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
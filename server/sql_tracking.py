@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_local = threading.local()
+
+RecordedQuery = namedtuple('RecordedQuery', ['statement', 'parameters', 'executemany'])
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+class QueryTimer:
+    def __init__(self, keep_statements=False):
+        self.count = 0
+        self.seconds = 0.0
+        # (statement, seconds) pairs, only kept when someone wants to look at them
+        self.statements = [] if keep_statements else None
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    recorders = getattr(_local, 'recorders', ())
+    if recorders:
+        query = RecordedQuery(statement, parameters, executemany)
+        for recorder in recorders:
+            recorder.append(query)
+    if getattr(_local, 'timers', ()) and context is not None:
+        context._query_started = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _time_statement(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_query_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    for timer in getattr(_local, 'timers', ()):
+        timer.count += 1
+        timer.seconds += elapsed
+        if timer.statements is not None:
+            timer.statements.append((statement, elapsed))
+
+@contextmanager
+def record_queries():
+    # Nested recorders are allowed; each one sees every statement issued on this thread
+    statements = []
+    recorders = getattr(_local, 'recorders', ())
+    _local.recorders = recorders + (statements,)
+    try:
+        yield statements
+    finally:
+        _local.recorders = recorders
+
+@contextmanager
+def time_queries(keep_statements=False):
+    timer = QueryTimer(keep_statements)
+    timers = getattr(_local, 'timers', ())
+    _local.timers = timers + (timer,)
+    try:
+        yield timer
+    finally:
+        _local.timers = timers
+
+def query_budget(max_statements):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with record_queries() as statements:
+                rv = fn(*args, **kwargs)
+            if len(statements) > max_statements:
+                message = (f"{request.endpoint} issued {len(statements)} SQL statements "
+                           f"(budget {max_statements})")
+                # Tests fail loudly so N+1 regressions are caught; production only warns
+                if current_app.testing or current_app.config.get('SQL_QUERY_BUDGET_ENFORCE'):
+                    raise QueryBudgetExceeded(message + ":\n" + "\n".join(q.statement for q in statements))
+                current_app.logger.warning(message)
+            return rv
+        wrapper.query_budget = max_statements
+        return wrapper
+    return decorator
@@ -0,0 +1,29 @@
+import os
+import sqlite3
+import threading
+
+class SQLiteConnections:
+    # Connections to a small side database that every worker process shares. One per
+    # thread, and never carried across a fork.
+    def __init__(self, path, synchronous='NORMAL'):
+        self.path = path
+        self.synchronous = synchronous
+        self._local = threading.local()
+
+    def get(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = sqlite3.connect(self.path, timeout=5, isolation_level=None,
+                                               check_same_thread=False)
+            local.connection.execute('PRAGMA journal_mode=WAL')
+            local.connection.execute(f'PRAGMA synchronous={self.synchronous}')
+            local.pid = os.getpid()
+        return local.connection
+
+def sqlite_path(storage):
+    # 'sqlite:///path' -> path, 'memory' -> None
+    if storage in (None, '', 'memory'):
+        return None
+    if storage.startswith('sqlite:///'):
+        return storage[len('sqlite:///'):]
+    raise ValueError(f"Unsupported storage '{storage}'; use memory or sqlite:///path")
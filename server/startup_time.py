@@ -0,0 +1,119 @@
+"""Cold-start benchmark: import, app construction and first-request latency.
+
+Every sample runs in a fresh interpreter so nothing is already imported or
+cached. Reports the median and worst of each phase; --output writes JSON that
+can be compared across commits, --imports lists the slowest imports
+(top level and one below).
+
+    python startup_time.py --runs 10 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PHASES = ('import', 'create_app', 'first_request', 'second_request', 'total')
+
+# Runs inside the child interpreter; prints one JSON line of phase timings
+PROBE = r'''
+import json, sys, time
+started = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+app = app_module.create_app()
+created = time.perf_counter()
+client = app.test_client()
+status = client.get(sys.argv[1]).status_code
+first = time.perf_counter()
+client.get(sys.argv[1])
+second = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'first_request': first - created,
+    'second_request': second - first,
+    'total': second - started,
+    'status': status,
+    'modules': len(sys.modules),
+}))
+'''
+
+def run_probe(path, env, importtime=False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', PROBE, path]
+    result = subprocess.run(command, capture_output=True, text=True, env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'probe failed')
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    return sample, result.stderr
+
+def slowest_imports(importtime_output, limit):
+    # "import time: self [us] | cumulative | imported package", nested imports indented by two
+    entries = []
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        # Top-level imports and what they import directly; deeper levels are mostly noise
+        if depth <= 1:
+            entries.append((int(cumulative_us), name.strip()))
+    return sorted(entries, reverse=True)[:limit]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/api/products?limit=24', help='route used for the first request')
+    parser.add_argument('--imports', type=int, default=0, metavar='N', help='also list the N slowest imports')
+    parser.add_argument('--output', help='write results as JSON')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='startup-')
+    env = dict(os.environ)
+    # Always a throwaway database and upload folder, even if the shell exports real ones
+    env['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'startup.db')
+    env.pop('DATABASE_READ_URL', None)
+    env['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    env['AUTH_STATE_STORAGE'] = env['RATE_LIMIT_STORAGE'] = env['CATALOG_CACHE_STORAGE'] = 'memory'
+
+    # The first run creates the schema; it is not measured
+    subprocess.run([sys.executable, '-c', 'import app; from extensions import db; a = app.create_app(); '
+                    'a.app_context().push(); db.create_all()'],
+                   check=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    samples = []
+    for _ in range(args.runs):
+        wall = time.perf_counter()
+        sample, _ = run_probe(args.path, env)
+        sample['process'] = time.perf_counter() - wall
+        samples.append(sample)
+
+    summary = {}
+    for phase in PHASES + ('process',):
+        values = [s[phase] * 1000 for s in samples]
+        summary[phase] = {'median_ms': round(statistics.median(values), 2), 'max_ms': round(max(values), 2)}
+        print(f"  {phase:<15} median {summary[phase]['median_ms']:>8.2f} ms   max {summary[phase]['max_ms']:>8.2f} ms")
+    print(f"  modules loaded  {samples[-1]['modules']}   first request HTTP {samples[-1]['status']}")
+
+    report = {'runs': args.runs, 'path': args.path, 'python': sys.version.split()[0],
+              'modules': samples[-1]['modules'], 'phases': summary}
+    if args.imports:
+        _, importtime = run_probe(args.path, env, importtime=True)
+        report['slowest_imports'] = [{'module': name, 'cumulative_ms': round(us / 1000, 2)}
+                                     for us, name in slowest_imports(importtime, args.imports)]
+        print("slowest imports:")
+        for entry in report['slowest_imports']:
+            print(f"  {entry['module']:<30} {entry['cumulative_ms']:>8.2f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp('shopease')
+
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(workdir / 'test.db')
+        SQLALCHEMY_READ_DATABASE_URI = None
+        UPLOAD_FOLDER = str(workdir / 'uploads')
+        IMAGE_WORKERS = 0
+        UPLOAD_CLEANUP_WORKERS = 0
+        RATE_LIMIT_ENABLED = False
+
+    from app import create_app
+    from extensions import db
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def db(app):
+    from extensions import db, catalog_cache
+
+    with app.app_context():
+        yield db
+        db.session.remove()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+        catalog_cache.bump_version()
+
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_headers(db):
+    from flask_jwt_extended import create_access_token
+    from models import User
+
+    admin = User(email='admin@example.com', password_hash='x', is_admin=True)
+    db.session.add(admin)
+    db.session.commit()
+    token = create_access_token(identity=str(admin.id), additional_claims={'is_admin': True})
+    return {'Authorization': f'Bearer {token}'}
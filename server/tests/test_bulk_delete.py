@@ -0,0 +1,53 @@
+import pytest
+
+from models import CartItem, Product, User
+
+
+@pytest.fixture
+def products(db):
+    shopper = User(email='shopper@example.com', password_hash='x')
+    db.session.add(shopper)
+    items = [Product(name=f'Item {i}', price=10 + i, stock=i % 3, category='Old' if i < 5 else 'New')
+             for i in range(15)]
+    db.session.add_all(items)
+    db.session.flush()
+    db.session.add(CartItem(user_id=shopper.id, product_id=items[0].id, quantity=1))
+    db.session.commit()
+    return items
+
+
+@pytest.mark.parametrize('product_filter', [
+    {'categroy': 'Old', 'in_stock': True},
+    {'category': 'Old', 'price_mxa': 12},
+    {'in_stock': 'maybe'},
+    {'category': ' , '},
+    {'category': ['Old', 'All']},
+    {'price_max': [12]},
+    {'price_max': 'cheap'},
+    {'price_max': 'nan'},
+    {'in_stock': False},
+])
+def test_invalid_filter_deletes_nothing(client, admin_headers, products, product_filter):
+    response = client.delete('/api/admin/products', json={'filter': product_filter}, headers=admin_headers)
+
+    assert response.status_code == 400
+    assert Product.query.count() == len(products)
+
+
+def test_filter_deletes_matching_products_and_their_cart_rows(client, admin_headers, products):
+    response = client.delete('/api/admin/products', json={'filter': {'category': 'Old', 'in_stock': True}},
+                             headers=admin_headers)
+
+    assert response.status_code == 200
+    assert response.json['deleted'] == 3
+    assert Product.query.filter_by(category='Old').count() == 2
+    assert CartItem.query.count() == 1
+
+
+def test_ids_delete_cascades_to_cart(client, admin_headers, products):
+    product_id = products[0].id
+    response = client.delete('/api/admin/products', json={'ids': [product_id, 9999]}, headers=admin_headers)
+
+    assert response.status_code == 200
+    assert response.json['ids'] == [product_id]
+    assert CartItem.query.count() == 0
@@ -0,0 +1,55 @@
+from sqlalchemy import exists, false
+
+import cart
+from cart import apply_operations
+from models import CartItem, Product, User
+
+
+def test_add_falls_back_to_update_when_a_concurrent_insert_wins(db, monkeypatch):
+    shopper = User(email='shopper@example.com', password_hash='x')
+    first, raced = Product(name='First', price=5, stock=10), Product(name='Raced', price=7, stock=10)
+    db.session.add_all([shopper, first, raced])
+    db.session.flush()
+    db.session.add(CartItem(user_id=shopper.id, product_id=raced.id, quantity=2))
+    db.session.commit()
+    shopper_id, first_id, raced_id = shopper.id, first.id, raced.id
+
+    # Replay the race: the line is committed by another request after this one's UPDATE
+    # and existence check both missed it
+    add_to_existing = cart._add_to_existing
+    missed = []
+
+    def late_update(user_id, product_id, quantity):
+        if product_id == raced_id and not missed:
+            missed.append(product_id)
+            return False
+        return add_to_existing(user_id, product_id, quantity)
+
+    monkeypatch.setattr(cart, '_add_to_existing', late_update)
+    monkeypatch.setattr(cart, 'exists', lambda: exists().where(false()))
+
+    apply_operations(shopper_id, [{'op': 'add', 'product_id': first_id, 'quantity': 1},
+                                  {'op': 'add', 'product_id': raced_id, 'quantity': 3}])
+    db.session.commit()
+
+    quantities = dict(db.session.query(CartItem.product_id, CartItem.quantity).filter_by(user_id=shopper_id))
+    assert quantities == {first_id: 1, raced_id: 5}
+
+
+def test_cart_items_carry_image_urls(client, db):
+    from flask_jwt_extended import create_access_token
+
+    shopper = User(email='shopper@example.com', password_hash='x')
+    product = Product(name='Lamp', price=20, stock=3, image_url='ab12.png')
+    db.session.add_all([shopper, product])
+    db.session.flush()
+    db.session.add(CartItem(user_id=shopper.id, product_id=product.id, quantity=1))
+    db.session.commit()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(shopper.id))}'}
+
+    item = client.get('/api/cart', headers=headers).get_json()[0]['product']
+
+    assert item['image_url'] == '/uploads/ab12.png'
+    assert item['image_variants']['thumbnail'] == {'webp': '/uploads/ab12_thumbnail.webp',
+                                                   'jpeg': '/uploads/ab12_thumbnail.jpg'}
+    assert item['srcset'].startswith('/uploads/ab12_thumbnail.webp 160w, ')
@@ -0,0 +1,70 @@
+from cache import CatalogCache, LRUCache, SharedCatalogVersion
+from models import Product
+
+
+def test_lru_cache_is_bounded_by_bytes():
+    cache = LRUCache(maxsize=100, maxbytes=10, sizeof=len)
+    for key in 'abcd':
+        cache.set(key, 'xxxx')
+
+    assert len(cache) == 2
+    assert cache.bytes == 8
+    assert cache.get('a') is None and cache.get('d') == 'xxxx'
+
+
+def test_compressed_variants_count_towards_the_byte_bound():
+    catalog = CatalogCache()
+    catalog.entries.maxbytes = 25
+    first = catalog.set(('a',), b'x' * 10)
+    catalog.set(('b',), b'y' * 10)
+
+    catalog.add_variant(first, 'gzip', b'z' * 6)
+
+    assert catalog.get(('a',)) is None
+    assert catalog.entries.bytes == 10
+
+
+def test_oversized_bodies_are_served_but_not_cached():
+    catalog = CatalogCache()
+    catalog.max_entry_bytes = 5
+    entry = catalog.set(('big',), b'x' * 6)
+
+    assert entry.body == b'x' * 6
+    assert catalog.get(('big',)) is None
+    assert catalog.skipped == 1
+
+
+def test_host_header_does_not_multiply_cache_entries(app, client, db):
+    from extensions import catalog_cache
+
+    db.session.add(Product(name='Lamp', price=10, stock=1, category='Home', image_url='lamp.png'))
+    db.session.commit()
+    responses = [client.get('/api/products', headers={'Host': host}) for host in ('a.example', 'b.example')]
+
+    assert responses[0].get_data() == responses[1].get_data()
+    assert responses[0].json[0]['image_url'] == '/uploads/lamp.png'
+    assert len(catalog_cache.entries) == 1
+
+
+def test_version_bumped_by_another_worker_misses(tmp_path):
+    path = str(tmp_path / 'shared.db')
+    worker, other = CatalogCache(), CatalogCache()
+    worker.shared, other.shared = SharedCatalogVersion(path), SharedCatalogVersion(path)
+    worker.set(('products',), b'[]', worker.current_version())
+
+    other.bump_version()
+
+    assert worker.get(('products',)) is None
+    assert len(worker.entries) == 0
+
+
+def test_body_built_across_another_workers_write_is_not_served(tmp_path):
+    path = str(tmp_path / 'shared.db')
+    worker, other = CatalogCache(), CatalogCache()
+    worker.shared, other.shared = SharedCatalogVersion(path), SharedCatalogVersion(path)
+
+    version = worker.current_version()
+    other.bump_version()
+    worker.set(('products',), b'[]', version)
+
+    assert worker.get(('products',)) is None
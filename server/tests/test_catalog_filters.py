@@ -0,0 +1,19 @@
+import pytest
+
+from extensions import catalog_cache
+
+
+@pytest.mark.parametrize('query', ['price_min=nan', 'price_max=NaN', 'price_max=inf', 'price_min=-inf',
+                                   'price_max=Infinity', 'price_min=1e400'])
+def test_non_finite_prices_are_rejected(client, query):
+    cached = len(catalog_cache.entries)
+
+    response = client.get(f'/api/products?{query}')
+
+    assert response.status_code == 400
+    assert 'finite' in response.get_json()['error']
+    assert len(catalog_cache.entries) == cached
+
+
+def test_finite_price_range_is_accepted(client):
+    assert client.get('/api/products?price_min=0.5&price_max=1e3').status_code == 200
@@ -0,0 +1,24 @@
+from models import CategoryFacet, Product
+
+
+def test_facets_report_a_missing_migration_as_503(client, db):
+    CategoryFacet.__table__.drop(db.engine)
+    try:
+        response = client.get('/api/products/facets')
+    finally:
+        CategoryFacet.__table__.create(db.engine)
+
+    assert response.status_code == 503
+    assert 'flask db upgrade' in response.get_json()['details']
+
+
+def test_facets_count_products_per_category(client, db):
+    db.session.add_all([Product(name='A', price=3, stock=1, category='Tools'),
+                        Product(name='B', price=9, stock=0, category='Tools')])
+    db.session.commit()
+
+    response = client.get('/api/products/facets')
+
+    assert response.status_code == 200
+    assert response.get_json()['categories'] == [
+        {'category': 'Tools', 'product_count': 2, 'in_stock_count': 1, 'min_price': 3, 'max_price': 9}]
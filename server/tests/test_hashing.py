@@ -0,0 +1,23 @@
+import time
+
+import pytest
+
+from hashing import HashingBusy, PasswordHasher
+
+
+def test_timed_out_job_holds_its_slot_until_it_finishes():
+    hasher = PasswordHasher()
+    hasher.workers, hasher.timeout = 1, 0.2
+    hasher._run(time.sleep, 0)  # start the worker process outside the timed calls
+
+    with pytest.raises(HashingBusy):
+        hasher._run(time.sleep, 1)
+    # The worker is still running the abandoned job, so there is no room for another
+    with pytest.raises(HashingBusy):
+        hasher._run(time.sleep, 0)
+    assert hasher.stats()['rejected'] == 1
+
+    time.sleep(1.2)
+    hasher._run(time.sleep, 0)
+    assert hasher.stats()['queue_depth'] == 0
+    hasher._executor.shutdown()
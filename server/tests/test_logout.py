@@ -0,0 +1,20 @@
+from flask_jwt_extended import create_access_token
+
+from models import User
+
+
+def test_logout_with_bearer_token_revokes_it(client, db):
+    user = User(email='shopper@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+    assert client.get('/api/cart', headers=headers).status_code == 200
+
+    # What the storefront's handleLogout sends
+    assert client.post('/api/logout', headers=headers).status_code == 200
+
+    assert client.get('/api/cart', headers=headers).status_code == 401
+
+
+def test_logout_without_token_revokes_nothing(client):
+    assert client.post('/api/logout').status_code == 200
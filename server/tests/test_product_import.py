@@ -0,0 +1,72 @@
+import io
+
+import pytest
+
+from models import Product
+
+
+def csv_body(rows):
+    return ('name,description,price,stock,category\n'
+            + ''.join(f'Item {i},Plain,{i + 1},5,Home\n' for i in range(rows))).encode()
+
+
+@pytest.fixture
+def small_batches(app):
+    batch_size = app.config['IMPORT_BATCH_SIZE']
+    app.config['IMPORT_BATCH_SIZE'] = 2
+    yield
+    app.config['IMPORT_BATCH_SIZE'] = batch_size
+
+
+def test_bad_byte_mid_stream_fails_only_its_row(client, admin_headers, small_batches):
+    body = csv_body(3) + b'Caf\xe9 Chair,Plain,9,1,Home\n' + b'Lamp,Plain,4,2,Home\n'
+
+    response = client.post('/api/admin/products/import', data=body, content_type='text/csv', headers=admin_headers)
+
+    assert response.status_code == 201
+    report = response.get_json()
+    assert report['inserted'] == 4 and report['failed'] == 1
+    assert report['errors'][0]['row'] == 4 and 'UTF-8' in report['errors'][0]['error']
+    assert Product.query.count() == 4
+
+
+def test_bad_ndjson_line_is_reported(client, admin_headers):
+    body = (b'{"name": "Desk", "description": "Plain", "price": 10, "stock": 1, "category": "Home"}\n'
+            b'{"name": "\xff"}\n')
+
+    response = client.post('/api/admin/products/import?format=ndjson', data=body,
+                           content_type='application/x-ndjson', headers=admin_headers)
+
+    assert response.status_code == 201
+    assert response.get_json()['errors'] == [{'row': 2, 'error': 'Invalid UTF-8 at byte 10 of the line'}]
+
+
+def test_malformed_csv_row_is_reported(client, admin_headers, small_batches):
+    # Longer than csv.field_size_limit(), which the reader refuses with csv.Error
+    body = csv_body(2) + b'Huge,' + b'x' * 200000 + b',3,1,Home\n' + b'Lamp,Plain,4,2,Home\n'
+
+    response = client.post('/api/admin/products/import', data=body, content_type='text/csv', headers=admin_headers)
+
+    assert response.status_code == 201
+    report = response.get_json()
+    assert report['inserted'] == 3 and report['failed'] == 1
+    assert report['errors'][0]['row'] == 3 and report['errors'][0]['error'].startswith('Malformed CSV')
+
+
+def test_undecodable_csv_header_is_a_bad_request(client, admin_headers):
+    response = client.post('/api/admin/products/import', data=b'n\xe4me,price\nDesk,3\n',
+                           content_type='text/csv', headers=admin_headers)
+
+    assert response.status_code == 400
+    assert Product.query.count() == 0
+
+
+def test_corrupt_images_archive_is_a_bad_request(client, admin_headers):
+    data = {'file': (io.BytesIO(csv_body(1)), 'products.csv', 'text/csv'),
+            'images': (io.BytesIO(b'not a zip file'), 'images.zip', 'application/zip')}
+
+    response = client.post('/api/admin/products/import', data=data, content_type='multipart/form-data',
+                           headers=admin_headers)
+
+    assert response.status_code == 400
+    assert 'zip' in response.get_json()['error'].lower()
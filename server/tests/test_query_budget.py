@@ -0,0 +1,76 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import select
+from sqlalchemy.orm import lazyload
+
+import routes.user_routes
+from models import CartItem, Product, User, WishlistItem
+from sql_tracking import QueryBudgetExceeded, query_budget
+
+
+@pytest.fixture
+def shopper(db):
+    user = User(email='shopper@example.com', password_hash='x')
+    products = [Product(name=f'Item {i}', price=10 + i, stock=10, category='Home', image_url=f'{i:02x}.png')
+                for i in range(6)]
+    db.session.add(user)
+    db.session.add_all(products)
+    db.session.flush()
+    # Several lines, so a per-item lazy load would show up as extra statements
+    db.session.add_all([CartItem(user_id=user.id, product_id=p.id, quantity=1) for p in products[:4]])
+    db.session.add_all([WishlistItem(user_id=user.id, product_id=p.id) for p in products[:4]])
+    db.session.commit()
+    ids = {'user': user.id, 'products': [p.id for p in products],
+           'cart_item': db.session.execute(select(CartItem.id).limit(1)).scalar()}
+    # Start every request with an empty identity map, as a real one would
+    db.session.expunge_all()
+    return ids
+
+
+@pytest.fixture
+def headers(shopper):
+    return {'Authorization': f"Bearer {create_access_token(identity=str(shopper['user']))}"}
+
+
+@pytest.mark.parametrize('path', ['/api/cart', '/api/cart?compact=1', '/api/wishlist', '/api/wishlist?compact=1',
+                                  '/api/session/bootstrap', '/api/session/bootstrap?limit=4'])
+def test_budgeted_reads_stay_within_budget(client, headers, path):
+    assert client.get(path, headers=headers).status_code == 200
+
+
+def test_anonymous_bootstrap_stays_within_budget(client, shopper):
+    assert client.get('/api/session/bootstrap').status_code == 200
+
+
+@pytest.mark.parametrize('product_index', [0, 5])
+def test_add_to_cart_stays_within_budget(client, shopper, headers, product_index):
+    # Index 0 is already in the cart (UPDATE path); index 5 is a new line (INSERT path)
+    response = client.post('/api/cart', json={'product_id': shopper['products'][product_index], 'quantity': 1},
+                           headers=headers)
+
+    assert response.status_code == 200
+
+
+def test_update_cart_item_stays_within_budget(client, shopper, headers):
+    response = client.put(f"/api/cart/{shopper['cart_item']}", json={'quantity': 2}, headers=headers)
+
+    assert response.status_code == 200
+
+
+def test_lazy_loaded_cart_products_exceed_the_budget(client, headers, monkeypatch):
+    # The regression the budget is there to catch: one product query per cart line
+    monkeypatch.setattr(routes.user_routes, 'joinedload', lazyload)
+
+    with pytest.raises(QueryBudgetExceeded, match='get_cart issued'):
+        client.get('/api/cart', headers=headers)
+
+
+def test_over_budget_view_fails_under_test(app, db):
+    @query_budget(1)
+    def view():
+        db.session.execute(select(User.id)).all()
+        db.session.execute(select(Product.id)).all()
+
+    with app.test_request_context('/'):
+        with pytest.raises(QueryBudgetExceeded, match='2 SQL statements'):
+            view()
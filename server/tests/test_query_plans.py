@@ -0,0 +1,35 @@
+import pytest
+
+from query_plans import HOT_ROUTES, check_route, prepare_routes
+
+PRODUCTS = 300
+
+
+@pytest.fixture(scope='module')
+def plan_routes(app):
+    # Seeded once: the routes run in order, and the later ones change the cart and catalog
+    from extensions import catalog_cache, db
+    from seed import seed_database
+
+    with app.app_context():
+        seed_database(products=PRODUCTS, users=40, rounds=4)
+        client = app.test_client()
+        values, user_headers, admin_headers = prepare_routes(app, client, PRODUCTS)
+        catalog_cache.bump_version()
+        yield client, values, user_headers, admin_headers
+        db.session.remove()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+        catalog_cache.bump_version()
+
+
+@pytest.mark.parametrize('route', HOT_ROUTES, ids=[route[0] for route in HOT_ROUTES])
+def test_hot_route_uses_indexes(plan_routes, route):
+    client, values, user_headers, admin_headers = plan_routes
+    response, statements = check_route(client, route, values, user_headers, admin_headers)
+
+    assert response.status_code < 400, response.get_data(as_text=True)
+    assert statements
+    problems = {statement: problems for statement, _, problems in statements if problems}
+    assert not problems, problems
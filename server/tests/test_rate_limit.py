@@ -0,0 +1,51 @@
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+from ratelimit import RateLimiter
+
+
+@pytest.fixture
+def limited_app():
+    app = Flask(__name__)
+    login_limits = 'ip:100/minute email:2/minute'
+    app.config.update(JWT_SECRET_KEY='rate-limit-test-secret-key-of-32-bytes',
+                      RATE_LIMITS={'login': login_limits, 'admin_login': login_limits},
+                      RATE_LIMIT_GROUPS={'login': 'login', 'admin_login': 'login'},
+                      RATE_LIMIT_WRITE='account:2/minute')
+    JWTManager(app)
+    RateLimiter().init_app(app)
+    app.add_url_rule('/login', 'login', lambda: 'ok', methods=['POST'])
+    app.add_url_rule('/admin/login', 'admin_login', lambda: 'ok', methods=['POST'])
+    app.add_url_rule('/cart', 'cart', lambda: 'ok', methods=['POST'])
+    return app
+
+
+def test_body_email_cannot_mint_fresh_buckets_for_token_writes(limited_app):
+    client = limited_app.test_client()
+    with limited_app.app_context():
+        headers = {'Authorization': f"Bearer {create_access_token(identity='7')}"}
+
+    statuses = [client.post('/cart', json={'email': f'random{i}@example.com'}, headers=headers).status_code
+                for i in range(4)]
+
+    assert statuses == [200, 200, 429, 429]
+
+
+def test_login_endpoints_share_one_allowance_per_email(limited_app):
+    client = limited_app.test_client()
+
+    statuses = [client.post(path, json={'email': 'victim@example.com'}).status_code
+                for path in ('/login', '/admin/login', '/login', '/admin/login')]
+
+    assert statuses == [200, 200, 429, 429]
+
+
+def test_login_is_limited_per_email(limited_app):
+    client = limited_app.test_client()
+
+    statuses = [client.post('/login', json={'email': 'Victim@example.com'}).status_code for _ in range(3)]
+    other = client.post('/login', json={'email': 'other@example.com'}).status_code
+
+    assert statuses == [200, 200, 429]
+    assert other == 200
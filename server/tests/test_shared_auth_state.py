@@ -0,0 +1,48 @@
+import time
+
+from security import AdminStatusCache, SharedAuthState, TokenBlocklist
+
+
+class FakeApp:
+    def __init__(self):
+        self.config = {'ADMIN_STATUS_CACHE_TTL': 60}
+        self.extensions = {}
+
+
+def worker(shared):
+    # What each serve.py worker process holds: its own caches over the same side database
+    blocklist, admin_cache = TokenBlocklist(), AdminStatusCache()
+    blocklist.init_app(FakeApp(), shared)
+    admin_cache.init_app(FakeApp(), shared)
+    return blocklist, admin_cache
+
+
+def test_logout_in_one_worker_revokes_everywhere(tmp_path):
+    path = str(tmp_path / 'auth.db')
+    first, _ = worker(SharedAuthState(path))
+    second, _ = worker(SharedAuthState(path))
+
+    first.revoke('token-1', time.time() + 60)
+
+    assert second.is_revoked('token-1')
+    assert not second.is_revoked('token-2')
+
+
+def test_expired_revocations_are_ignored(tmp_path):
+    blocklist, _ = worker(SharedAuthState(str(tmp_path / 'auth.db')))
+    blocklist.shared.revoke('old', time.time() - 1)
+
+    assert not blocklist.is_revoked('old')
+
+
+def test_demotion_in_one_worker_invalidates_everywhere(tmp_path):
+    path = str(tmp_path / 'auth.db')
+    _, first = worker(SharedAuthState(path))
+    _, second = worker(SharedAuthState(path))
+    database = {7: True}
+
+    assert second.is_admin(7, database.get)
+    database[7] = False
+    first.invalidate(7)
+
+    assert not second.is_admin(7, database.get)
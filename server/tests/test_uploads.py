@@ -0,0 +1,34 @@
+import io
+import os
+import time
+
+from uploads import release_uploads, store_upload
+
+
+def test_cleanup_keeps_a_file_reused_after_the_delete(app, db, tmp_path):
+    filename, created = store_upload(io.BytesIO(b'image bytes'), str(tmp_path), 'png')
+    assert created
+    queued_at = time.time()
+    os.utime(tmp_path / filename, (queued_at - 60, queued_at - 60))
+
+    # A new product uploads the same bytes; it has not committed when the cleaner runs
+    assert store_upload(io.BytesIO(b'image bytes'), str(tmp_path), 'png') == (filename, False)
+
+    assert release_uploads([filename], str(tmp_path), queued_at) == 0
+    assert (tmp_path / filename).read_bytes() == b'image bytes'
+    assert sorted(os.listdir(tmp_path)) == [filename]
+
+
+def test_cleanup_removes_an_unreferenced_file(app, db, tmp_path):
+    filename, _ = store_upload(io.BytesIO(b'image bytes'), str(tmp_path), 'png')
+
+    assert release_uploads([filename], str(tmp_path), time.time() + 1) == 1
+    assert os.listdir(tmp_path) == []
+
+
+def test_upload_stores_the_bytes_again_once_released(app, db, tmp_path):
+    filename, _ = store_upload(io.BytesIO(b'image bytes'), str(tmp_path), 'png')
+    release_uploads([filename], str(tmp_path), time.time() + 1)
+
+    assert store_upload(io.BytesIO(b'image bytes'), str(tmp_path), 'png') == (filename, True)
+    assert (tmp_path / filename).exists()
@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select
+from extensions import db
+from images import IMAGE_VARIANTS, remove_variants
+from models import Product
+
+CHUNK_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+CONTENT_ADDRESSED_RE = re.compile(
+    r'^[0-9a-f]{64}(_(%s))?\.[a-z0-9]+$' % '|'.join(IMAGE_VARIANTS))
+
+def is_content_addressed(filename):
+    return bool(CONTENT_ADDRESSED_RE.match(filename))
+
+def store_upload(stream, upload_folder, extension):
+    # Stream to a temp file while hashing, then move it under its content hash.
+    # Returns (filename, created); created is False when identical bytes were already stored.
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=upload_folder, prefix='.upload-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+
+        filename = f"{digest.hexdigest()}.{extension.lower()}"
+        target = os.path.join(upload_folder, filename)
+        if os.path.exists(target):
+            try:
+                # A fresh mtime tells a cleanup queued before now that the file is in use again
+                os.utime(target)
+                os.remove(tmp_path)
+                return filename, False
+            except FileNotFoundError:
+                # Released between the check and the touch; store these bytes after all
+                pass
+        os.replace(tmp_path, target)
+        return filename, True
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def reference_count(filename):
+    return db.session.query(Product.id).filter(Product.image_url == filename).count()
+
+def release_upload(filename, upload_folder):
+    # Call after the owning product is gone; the file is only removed once nothing references it
+    if not filename or reference_count(filename) > 0:
+        return False
+    path = os.path.join(upload_folder, filename)
+    if os.path.exists(path):
+        os.remove(path)
+    remove_variants(filename, upload_folder)
+    return True
+
+def _remove_unless_reused(filename, upload_folder, queued_at):
+    # The file is moved aside before its mtime is read, so store_upload either touches it
+    # first (and it is put back) or finds it gone and writes its own copy
+    path = os.path.join(upload_folder, filename)
+    parked = os.path.join(upload_folder, f'.release-{filename}')
+    try:
+        os.rename(path, parked)
+    except FileNotFoundError:
+        parked = None
+    if parked:
+        if os.stat(parked).st_mtime >= queued_at:
+            os.replace(parked, path)
+            return False
+        os.remove(parked)
+    if not os.path.exists(path):
+        remove_variants(filename, upload_folder)
+    return True
+
+def release_uploads(filenames, upload_folder, queued_at=None):
+    # Batch form of release_upload: one reference query for the whole set of files.
+    # queued_at is when the owning products were deleted; a file reused by an upload since
+    # then belongs to a product that may not have committed yet, so it is kept.
+    queued_at = time.time() if queued_at is None else queued_at
+    filenames = {filename for filename in filenames if filename}
+    if not filenames:
+        return 0
+    referenced = set(db.session.execute(
+        select(Product.image_url).where(Product.image_url.in_(filenames)).distinct()).scalars())
+    released = 0
+    for filename in filenames - referenced:
+        try:
+            if _remove_unless_reused(filename, upload_folder, queued_at):
+                released += 1
+        except OSError as e:
+            logger.warning("Could not delete image file %s: %s", filename, e)
+    return released
+
+class UploadCleaner:
+    # Removes the files of deleted products off the request path
+    def __init__(self):
+        self.workers = 1
+        self.app = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = app.config.get('UPLOAD_CLEANUP_WORKERS', 1)
+        self.app = app
+        app.extensions['upload_cleaner'] = self
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='upload-cleaner')
+        return self._executor
+
+    def _process(self, filenames, upload_folder, queued_at):
+        try:
+            # Its own app context, and so its own session; the request's may be gone by now
+            with self.app.app_context():
+                released = release_uploads(filenames, upload_folder, queued_at)
+            logger.info("Released uploads", extra={"candidates": len(filenames), "released": released})
+        except Exception:
+            logger.exception("Upload cleanup failed", extra={"candidates": len(filenames)})
+
+    def submit(self, filenames, upload_folder=None):
+        # Call after the deleting transaction has committed, or every file still looks referenced
+        filenames = [filename for filename in filenames if filename]
+        if not filenames:
+            return None
+        upload_folder = upload_folder or self.app.config['UPLOAD_FOLDER']
+        queued_at = time.time()
+        if self.workers <= 0:
+            return self._process(filenames, upload_folder, queued_at)
+        return self._get_executor().submit(self._process, filenames, upload_folder, queued_at)
+
+upload_cleaner = UploadCleaner()
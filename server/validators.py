@@ -0,0 +1,32 @@
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
+
+class ProductValidationError(ValueError):
+    pass
+
+def allowed_file(filename):
+    return '.' in filename and \
+        filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def validate_product_fields(name, description, price_str, stock_str, category):
+    if not all([name, description, price_str, stock_str, category]):
+        raise ProductValidationError("Missing required text or selection fields")
+
+    try:
+        price_float = float(price_str)
+        if price_float <= 0: raise ValueError("Price must be positive.")
+    except (ValueError, TypeError):
+        raise ProductValidationError("Invalid price format. Must be a positive number.")
+
+    try:
+        stock_int = int(stock_str)
+        if stock_int < 0: raise ValueError("Stock cannot be negative.")
+    except (ValueError, TypeError):
+        raise ProductValidationError("Invalid stock format. Must be a non-negative integer.")
+
+    return {
+        'name': name,
+        'description': description,
+        'price': price_float,
+        'stock': stock_int,
+        'category': category
+    }